@@ -172,11 +172,11 @@ Tform = (Ct * L / v) * pow(pitwo,-0.61)
 Dsimple = 1.56 * Dpiscale
      
 if Dsimple < Dstar :
-	  Dfinal = Dsimple
-	  cratertype = "Simple"
+    Dfinal = Dsimple
+    cratertype = "Simple"
 else:
-        Dfinal = pow(Dsimple,1.18) / pow(Dstar,0.18)
-	cratertype = "Complex"
+    Dfinal = pow(Dsimple,1.18) / pow(Dstar,0.18)
+    cratertype = "Complex"
 
 		
 
@@ -186,7 +186,7 @@ if Dsimple < Dstar * 1.4 :
     
          
 if Dfinal > Dpr :
-	 cratertype = "Peak-ring"
+    cratertype = "Peak-ring"
     
 
 #  continEjectaBlanket Dfinal + Dfinal
@@ -209,10 +209,8 @@ impactorMass = impactorVolume * projectileDensity
 #  Calculate Seismic magnitude at impact site - Equation 40*
 
 #      M = 0.67 *  (Math.log(projectileKE) / Math.LN10) - 5.87;
-#  AntiLog(X) = 10^X or 10**X   
-# M = 0.67 * math.antilog(projectileKE) - 5.87
 
-M = 0.67 * 10**projectileKE - 5.87
+M = 0.67 * math.log10(projectileKE) - 5.87
 
 #  Calculate Seismic effect at radius r km from impact
 
@@ -255,21 +253,21 @@ print(Tform)
 
 print('Diagnostics')
 
-print('projectileDensity = ' + projectileDensity)
-print('targetDensity     = ' + targetDensity)
-print('L                 = ' + L)
-print('v                 = ' + v)
-print('theta             = ' + theta)
-print('anglefac          = ' + anglefac)
-print('densfac           = ' + densfac)
-print('pifac             = ' + pifac)
-print('Ct                = ' + Ct)
-print('Dstar             = ' + Dstar)
-print('Dpr               = ' + Dpr)
-print('m                 = ' + m)
-print('projectileKE      = ' + projectileKE)
-print('pitwo             = ' + pitwo)
-print('dscale            = ' + dscale)
-print('gsmall            = ' + gsmall)
-print('cratertype        = ' + cratertype)
+print('projectileDensity = ' + str(projectileDensity))
+print('targetDensity     = ' + str(targetDensity))
+print('L                 = ' + str(L))
+print('v                 = ' + str(v))
+print('theta             = ' + str(theta))
+print('anglefac          = ' + str(anglefac))
+print('densfac           = ' + str(densfac))
+print('pifac             = ' + str(pifac))
+print('Ct                = ' + str(Ct))
+print('Dstar             = ' + str(Dstar))
+print('Dpr               = ' + str(Dpr))
+print('m                 = ' + str(m))
+print('projectileKE      = ' + str(projectileKE))
+print('pitwo             = ' + str(pitwo))
+print('dscale            = ' + str(dscale))
+print('gsmall            = ' + str(gsmall))
+print('cratertype        = ' + str(cratertype))
 
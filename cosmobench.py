@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+# Accuracy and throughput benchmarks of the cosmology integrals.
+# Every path (the scalar cosmocalc.py loop, the batch functions and the
+# table lookups) is run over fixed redshift sets for several
+# cosmologies.  Each run records wall time, evaluations per second,
+# peak memory and the largest relative error against high precision
+# quadrature, and the results go to a JSON report that can be compared
+# with the report of an earlier release.
+#
+#   python cosmobench.py report.json --sizes 1 1000 1000000 --baseline old.json
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from math import sqrt, sin, exp, pi, log10
+
+import numpy as np
+
+import cosmogrid
+from cosmology import batch, batch_cumulative, batch_adaptive, batch_flat, densities, c, Tyr
+from cosmotable import Cosmology, cache_clear
+
+SIZES = (1, 1000, 1000000)
+
+# name: (H0, WM, WV), WV None for flat
+COSMOLOGIES = {
+    'flat': (69.6, 0.286, None),
+    'open': (70., 0.3, 0.),
+    'closed': (70., 0.3, 0.9),
+    'matter': (50., 1., 0.),
+}
+
+# columns whose errors are reported
+CHECKED = ('zage_Gyr', 'DTT_Gyr', 'DCMR_Mpc', 'DL_Mpc', 'V_Gpc')
+
+SCALAR_MAX = 1000  # objects timed with the pure Python loop
+REF_MAX = 20000    # objects checked against the reference
+MIN_TIME = 0.2     # seconds of repeats for timing small sets
+MIN_WALL = 1e-3    # seconds below which timings are too noisy to compare
+
+
+def redshifts(size, seed=0):
+    """The fixed redshift set of a given size, log-uniform in 0.001..10."""
+    return 10**np.random.default_rng([seed, size]).uniform(-3., 1., size)
+
+
+def scalar(z, H0, WM, WV):
+    """cosmocalc.py for one redshift, as a plain Python loop."""
+    WM, WV, WR, WK = [float(w) for w in densities(H0, WM, WV)]
+    n = 1000
+    az = 1.0/(1+1.0*z)
+    age = 0.
+    for i in range(n):
+        a = az*(i+0.5)/n
+        adot = sqrt(WK+(WM/a)+(WR/(a*a))+(WV*a*a))
+        age = age + 1./adot
+    zage = az*age/n
+    DTT = 0.0
+    DCMR = 0.0
+    for i in range(n):
+        a = az+(1-az)*(i+0.5)/n
+        adot = sqrt(WK+(WM/a)+(WR/(a*a))+(WV*a*a))
+        DTT = DTT + 1./adot
+        DCMR = DCMR + 1./(a*adot)
+    DTT = (1.-az)*DTT/n
+    DCMR = (1.-az)*DCMR/n
+    x = sqrt(abs(WK))*DCMR
+    if x > 0.1:
+        if WK > 0:
+            ratio = 0.5*(exp(x)-exp(-x))/x
+            vratio = (0.125*(exp(2.*x)-exp(-2.*x))-x/2.)/(x*x*x/3.)
+        else:
+            ratio = sin(x)/x
+            vratio = (x/2. - sin(2.*x)/4.)/(x*x*x/3.)
+    else:
+        y = x*x
+        if WK < 0:
+            y = -y
+        ratio = 1. + y/6. + y*y/120.
+        vratio = 1. + y/5. + (2./105.)*y*y
+    DL = az*ratio*DCMR/(az*az)
+    DL_Mpc = (c/H0)*DL
+    return {'zage_Gyr': (Tyr/H0)*zage, 'DTT_Gyr': (Tyr/H0)*DTT,
+            'DCMR_Mpc': (c/H0)*DCMR, 'DL_Mpc': DL_Mpc,
+            'V_Gpc': 4.*pi*((0.001*c/H0)**3)*vratio*DCMR*DCMR*DCMR/3.,
+            'distmod': 5*log10(DL_Mpc*1e6)-5}
+
+
+def _scalar_batch(z, H0, WM, WV):
+    rows = [scalar(x, H0, WM, WV) for x in z.tolist()]
+    return {k: np.array([r[k] for r in rows]) for k in CHECKED}
+
+
+def paths(tmpdir):
+    """name -> (setup, run) of every benchmarked path.
+
+    setup(H0, WM, WV) returns the state run(z, state) needs, so that
+    table building is timed apart from the lookups."""
+    def grid_setup(H0, WM, WV):
+        path = os.path.join(tmpdir, '%r-%r-%r.grid' % (H0, WM, WV))
+        cosmogrid.build(path, H0, WM, WV)
+        return cosmogrid.Grid(path)
+
+    def table_setup(H0, WM, WV):
+        cosmo = Cosmology(H0, WM, WV)
+        cosmo.tables
+        return cosmo
+
+    return {
+        'scalar': (lambda *p: p, lambda z, p: _scalar_batch(z, *p)),
+        'batch': (lambda *p: p, lambda z, p: batch(z, *p)),
+        'batch_cumulative': (lambda *p: p, lambda z, p: batch_cumulative(z, *p)),
+        'batch_adaptive': (lambda *p: p, lambda z, p: batch_adaptive(z, *p)[0]),
+        'batch_flat': (lambda *p: p, lambda z, p: batch_flat(z, *p)),
+        'table': (table_setup, lambda z, cosmo: cosmo.batch(z)),
+        'grid': (grid_setup, lambda z, grid: grid(z)),
+    }
+
+
+def _errors(out, ref):
+    # the grid files have no DTT or V columns
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {k: float(np.nanmax(np.abs(np.asarray(out[k])[:ref[k].size]/ref[k]-1)))
+                for k in CHECKED if k in out}
+
+
+def run(sizes=SIZES, cosmologies=COSMOLOGIES, names=None, seed=0):
+    """Run the benchmarks and return the report as a dict."""
+    records = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        every = paths(tmpdir)
+        for cname, params in cosmologies.items():
+            states = {}
+            refs = {}
+            for name, (setup, call) in every.items():
+                if names and name not in names:
+                    continue
+                cache_clear()
+                t = time.perf_counter()
+                states[name] = setup(*params)
+                setup_s = time.perf_counter()-t
+                for size in sizes:
+                    z = redshifts(size, seed)
+                    if name == 'scalar':
+                        z = z[:SCALAR_MAX]
+                    # keyed by the redshifts themselves, as the scalar
+                    # path only takes the first SCALAR_MAX
+                    zr = z[:REF_MAX]
+                    zkey = zr.tobytes()
+                    if zkey not in refs:
+                        with np.errstate(invalid='ignore'):
+                            refs[zkey], _ = batch_adaptive(zr, *params, rtol=1e-12)
+                    ref = refs[zkey]
+
+                    # wall time, repeating small sets
+                    reps = 0
+                    best = np.inf
+                    start = time.perf_counter()
+                    while True:
+                        t = time.perf_counter()
+                        call(z, states[name])
+                        best = min(best, time.perf_counter()-t)
+                        reps += 1
+                        if time.perf_counter()-start > MIN_TIME:
+                            break
+
+                    tracemalloc.start()
+                    out = call(z, states[name])
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                    records.append({
+                        'path': name, 'cosmology': cname, 'size': int(size),
+                        'objects': int(z.size), 'repeats': reps,
+                        'setup_s': setup_s, 'wall_s': best,
+                        'evals_per_s': z.size/best if best > 0 else None,
+                        'peak_MB': peak/2.**20,
+                        'max_rel_error': _errors(out, ref),
+                    })
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'seed': seed,
+        'records': records,
+    }
+
+
+def compare(old, new, slower=1.5, worse=10., min_wall=MIN_WALL):
+    """Lines describing the records of new that are more than `slower`
+    times slower (and take over min_wall seconds) or have errors more
+    than `worse` times larger (and above 1e-12) than the same record of
+    old.  Times are the best of the repeats."""
+    def key(r):
+        return r['path'], r['cosmology'], r['size']
+    before = {key(r): r for r in old['records']}
+    lines = []
+    for r in new['records']:
+        b = before.get(key(r))
+        if b is None:
+            continue
+        if r['wall_s'] > max(slower*b['wall_s'], min_wall):
+            lines.append('%s/%s/%d: %.3g s, was %.3g s' % (key(r) + (r['wall_s'], b['wall_s'])))
+        for k, e in r['max_rel_error'].items():
+            e0 = b['max_rel_error'].get(k)
+            if e0 is not None and e > 1e-12 and e > worse*e0:
+                lines.append('%s/%s/%d: %s error %.2g, was %.2g' % (key(r) + (k, e, e0)))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the cosmology integrals')
+    parser.add_argument('report', help='JSON report to write')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='redshift set sizes')
+    parser.add_argument('--paths', nargs='+', default=None, help='only these paths')
+    parser.add_argument('--cosmologies', nargs='+', default=None, choices=sorted(COSMOLOGIES),
+                        help='only these cosmologies')
+    parser.add_argument('--baseline', default=None, help='earlier report to compare against')
+    args = parser.parse_args(argv)
+    cosmologies = COSMOLOGIES
+    if args.cosmologies:
+        cosmologies = {k: COSMOLOGIES[k] for k in args.cosmologies}
+    report = run(args.sizes, cosmologies, args.paths)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=1)
+    for r in report['records']:
+        print('%-16s %-7s %8d  %10.3g /s  %8.1f MB  err %.1e' % (
+            r['path'], r['cosmology'], r['size'], r['evals_per_s'] or 0, r['peak_MB'],
+            max(r['max_rel_error'].values())), file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            lines = compare(json.load(f), report)
+        for line in lines:
+            print('regression: ' + line, file=sys.stderr)
+        return 1 if lines else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
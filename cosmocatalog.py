@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# Streaming catalog mode for the cosmology calculator.
+# Reads (id, z) rows from a CSV file or a .npy array in fixed-size
+# chunks, runs each chunk through a cached Cosmology, and appends the
+# output columns to the output file, so memory use does not grow with
+# the number of rows.
+#
+#   python cosmocatalog.py galaxies.csv distances.csv --H0 69.6 --WM 0.286
+
+import argparse
+import csv
+import itertools
+import sys
+
+import numpy as np
+
+from cosmology import H0_default, WM_default
+from cosmotable import Cosmology
+
+# output columns after id and z
+COLUMNS = ('DL_Mpc', 'DA_Mpc', 'kpc_DA', 'distmod', 'zage_Gyr')
+
+CHUNK = 1 << 16  # rows per chunk
+
+
+def _float(s):
+    # a missing or invalid redshift is nan, which gives nan outputs
+    try:
+        return float(s)
+    except ValueError:
+        return np.nan
+
+
+def _read_csv(path, chunk, id_col, z_col):
+    with open(path, newline='') as f:
+        rows = csv.reader(f)
+        first = next(rows, None)
+        if first is None:
+            return
+        i, j = 0, 1
+        if id_col in first and z_col in first:
+            # a header line names the columns
+            i, j = first.index(id_col), first.index(z_col)
+        else:
+            rows = itertools.chain([first], rows)
+        while True:
+            block = list(itertools.islice(rows, chunk))
+            if not block:
+                return
+            ids = np.array([r[i] if i < len(r) else '' for r in block])
+            z = np.array([_float(r[j]) if j < len(r) else np.nan for r in block])
+            yield ids, z
+
+
+def _read_npy(path, chunk, id_col, z_col):
+    data = np.load(path, mmap_mode='r')
+    if data.dtype.names:
+        ids, z = data[id_col], data[z_col]
+    else:
+        ids, z = data[:, 0], data[:, 1]
+    for lo in range(0, len(z), chunk):
+        yield np.asarray(ids[lo:lo+chunk]), np.asarray(z[lo:lo+chunk], dtype=float)
+
+
+def read(path, chunk=CHUNK, id_col='id', z_col='z'):
+    """Yield (ids, z) arrays of at most chunk rows from a catalog.
+
+    A .npy file is memory mapped and may be a structured array with id
+    and z fields or a two column array; anything else is read as CSV,
+    with or without a header line.  Missing or invalid redshifts are
+    read as nan."""
+    if str(path).endswith('.npy'):
+        return _read_npy(path, chunk, id_col, z_col)
+    return _read_csv(path, chunk, id_col, z_col)
+
+
+def rows(path):
+    """Number of rows of a .npy catalog, without reading it."""
+    return np.load(path, mmap_mode='r').shape[0]
+
+
+def process(src, dst, H0=H0_default, WM=WM_default, WV=None, WR=None,
+            chunk=CHUNK, id_col='id', z_col='z'):
+    """Run a whole catalog through the calculator, chunk by chunk.
+
+    The output is CSV, or a structured .npy array if dst ends in .npy,
+    which needs a .npy input so that the row count is known up front.
+    Returns the number of rows written."""
+    cosmo = Cosmology(H0, WM, WV, WR)
+    npy = str(dst).endswith('.npy')
+    if npy and not str(src).endswith('.npy'):
+        raise ValueError('.npy output needs a .npy catalog')
+    done = 0
+    out = None
+    try:
+        for ids, z in read(src, chunk, id_col, z_col):
+            res = cosmo.batch(z)
+            if npy:
+                if out is None:
+                    dtype = [('id', ids.dtype), ('z', float)] + [(k, float) for k in COLUMNS]
+                    out = np.lib.format.open_memmap(dst, mode='w+', dtype=dtype, shape=(rows(src),))
+                block = out[done:done+len(z)]
+                block['id'] = ids
+                block['z'] = z
+                for k in COLUMNS:
+                    block[k] = res[k]
+            else:
+                if out is None:
+                    out = open(dst, 'w')
+                    out.write(','.join(('id', 'z') + COLUMNS) + '\n')
+                line = '%s' + ',%.8g'*(1+len(COLUMNS)) + '\n'
+                cols = [res[k].tolist() for k in COLUMNS]
+                out.writelines(line % row for row in zip(ids.tolist(), z.tolist(), *cols))
+            done += len(z)
+    finally:
+        if out is not None:
+            if npy:
+                out.flush()
+            else:
+                out.close()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cosmology calculator for (id, z) catalogs')
+    parser.add_argument('catalog', help='input .csv or .npy with id and z columns')
+    parser.add_argument('output', help='output .csv or .npy')
+    parser.add_argument('--H0', type=float, default=H0_default, help='Hubble constant')
+    parser.add_argument('--WM', type=float, default=WM_default, help='Omega(matter)')
+    parser.add_argument('--WV', type=float, default=None, help='Omega(vacuum), flat if omitted')
+    parser.add_argument('--chunk', type=int, default=CHUNK, help='rows per chunk')
+    parser.add_argument('--id-col', default='id', help='name of the id column')
+    parser.add_argument('--z-col', default='z', help='name of the redshift column')
+    args = parser.parse_args(argv)
+    n = process(args.catalog, args.output, args.H0, args.WM, args.WV,
+                chunk=args.chunk, id_col=args.id_col, z_col=args.z_col)
+    print('%d rows written to %s' % (n, args.output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+# Precomputed distance grids in binary files shared through mmap.
+# A grid file holds a small header and float64 rows of z, DCMR_Mpc,
+# DA_Mpc, DL_Mpc and zage_Gyr on a uniform grid in ln(1+z) for one
+# cosmology.  It is written once, and every process that opens it maps
+# the same pages read-only, so any number of workers share a single
+# physical copy and start without integrating anything.
+#
+#   python cosmogrid.py planck.grid --H0 67.7 --WM 0.31
+
+import argparse
+import os
+import struct
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+from cosmology import H0_default, WM_default, c, densities, batch_cumulative, batch_adaptive
+
+MAGIC = b'COSMOGRD'
+VERSION = 1
+
+# rows of the grid, after z
+COLUMNS = ('DCMR_Mpc', 'DA_Mpc', 'DL_Mpc', 'zage_Gyr')
+
+# distances, which are interpolated as D/z, tending to c/H0 at z = 0
+DISTANCES = ('DCMR_Mpc', 'DA_Mpc', 'DL_Mpc')
+
+# where the interpolation error is checked in each cell
+CHECKS = (0.25, 0.5, 0.75)
+
+# magic, version, nodes, H0, WM, WV, WR, WK, zmax, max_error of each column
+_HEAD = struct.Struct('<8sII6d%dd' % len(COLUMNS))
+HEADER = 128  # bytes before the rows, keeping them 8 byte aligned
+
+
+def build(path, H0=H0_default, WM=WM_default, WV=None, WR=None, zmax=1100., nodes=1 << 16):
+    """Write the grid file of a cosmology to path.
+
+    The file is written under a temporary name and renamed into place,
+    so processes racing to build the same grid never see a partial one.
+    The largest relative error of the interpolation, measured at a
+    quarter, half and three quarters of every cell against adaptive
+    quadrature, is stored in the header."""
+    WM, WV, WR, WK = [float(w) for w in densities(H0, WM, WV, WR)]
+    H0 = float(H0)
+    h = np.log1p(zmax)/(nodes-1)
+    x = h*np.arange(nodes)
+    z = np.expm1(x)
+    with np.errstate(divide='ignore'):
+        out = batch_cumulative(z, H0, WM, WV, WR, n=16*nodes)
+    rows = np.array([z] + [out[k] for k in COLUMNS])
+
+    # check the interpolation within every cell
+    zc = np.expm1(x[:-1]+h*np.array(CHECKS)[:, None]).ravel()
+    ref, _ = batch_adaptive(zc, H0, WM, WV, WR, rtol=1e-11)
+    got = _interpolate(rows, H0, h, zc)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_error = [float(np.nanmax(np.abs(got[k]/ref[k]-1))) for k in COLUMNS]
+
+    head = _HEAD.pack(MAGIC, VERSION, nodes, H0, WM, WV, WR, WK, float(zmax), *max_error)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(head.ljust(HEADER, b'\0'))
+        f.write(rows.astype('<f8').tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def _interpolate(rows, H0, h, z):
+    # the columns at z in [0, zmax]: the node is found in ln(1+z), the
+    # weights are linear in z, and distances are interpolated as D/z
+    x = np.log1p(z)/h
+    i = np.clip(x.astype(int), 0, rows.shape[1]-2)
+    zs = rows[0]
+    z0, z1 = zs[i], zs[i+1]
+    t = (z-z0)/(z1-z0)
+    out = {}
+    for k, row in zip(COLUMNS, rows[1:]):
+        if k in DISTANCES:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                q0 = np.where(z0 > 0, row[i]/z0, c/H0)
+            v = z*(q0*(1-t)+row[i+1]/z1*t)
+        else:
+            v = row[i]*(1-t)+row[i+1]*t
+        out[k] = v
+    return out
+
+
+class Grid(object):
+    """A grid file mapped read-only, interpolating linearly in z
+    between nodes spaced uniformly in ln(1+z); distances are
+    interpolated as D/z, which is smooth down to z = 0.
+
+    Redshifts outside [0, zmax] give nan."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            head = f.read(_HEAD.size)
+        if len(head) < _HEAD.size or head[:8] != MAGIC:
+            raise ValueError('%s is not a cosmology grid file' % path)
+        fields = _HEAD.unpack(head)
+        if fields[1] != VERSION:
+            raise ValueError('%s has grid version %d, expected %d' % (path, fields[1], VERSION))
+        self.path = path
+        self.nodes = fields[2]
+        self.H0, self.WM, self.WV, self.WR, self.WK, self.zmax = fields[3:9]
+        self.max_error = dict(zip(COLUMNS, fields[9:]))
+        self.rows = np.memmap(path, dtype='<f8', mode='r', offset=HEADER,
+                              shape=(1+len(COLUMNS), self.nodes))
+        self.h = np.log1p(self.zmax)/(self.nodes-1)
+
+    def __repr__(self):
+        return 'Grid(%r)' % self.path
+
+    @property
+    def z(self):
+        return self.rows[0]
+
+    def __call__(self, z):
+        """Dict of COLUMNS and kpc_DA at z, with the shape of z."""
+        z = np.asarray(z, dtype=float)
+        bad = ~((z >= 0) & (z <= self.zmax))
+        out = _interpolate(self.rows, self.H0, self.h, np.where(bad, 0., z))
+        for k in COLUMNS:
+            out[k] = np.where(bad, np.nan, out[k])
+        out['kpc_DA'] = out['DA_Mpc']/206.264806
+        return out
+
+
+@lru_cache(maxsize=None)
+def load(path):
+    """The Grid of path, mapped once per process."""
+    return Grid(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a memory-mappable cosmology grid file')
+    parser.add_argument('output', help='grid file to write')
+    parser.add_argument('--H0', type=float, default=H0_default, help='Hubble constant')
+    parser.add_argument('--WM', type=float, default=WM_default, help='Omega(matter)')
+    parser.add_argument('--WV', type=float, default=None, help='Omega(vacuum), flat if omitted')
+    parser.add_argument('--zmax', type=float, default=1100., help='highest redshift')
+    parser.add_argument('--nodes', type=int, default=1 << 16, help='grid nodes')
+    args = parser.parse_args(argv)
+    build(args.output, args.H0, args.WM, args.WV, zmax=args.zmax, nodes=args.nodes)
+    g = Grid(args.output)
+    print('%s: %d nodes, max interpolation error %s' % (
+        args.output, g.nodes, ', '.join('%s %.1e' % kv for kv in g.max_error.items())),
+        file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
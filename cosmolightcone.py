@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# Mock light-cones uniform in comoving volume.
+# Redshifts are drawn by inverse-CDF lookup on a table of the enclosed
+# comoving volume V(z), sky positions uniformly on the sphere inside an
+# ra/dec box, and the objects are produced in fixed-size chunks so a
+# catalog of any length streams to disk in bounded memory.
+#
+#   python cosmolightcone.py mock.npy 1000000000 --zmax 2 --ra 0 30 --dec -10 10
+
+import argparse
+import sys
+
+import numpy as np
+
+from cosmology import H0_default, WM_default
+from cosmotable import Cosmology
+from cosmovolume import FULL_SKY, volume
+
+# output columns
+COLUMNS = ('ra', 'dec', 'z', 'DCMR_Mpc', 'DL_Mpc')
+
+DTYPE = np.dtype([(k, float) for k in COLUMNS])
+
+CHUNK = 1 << 20  # objects per chunk
+BLOCK = 1 << 16  # objects per random stream
+
+
+class LightCone(object):
+    """A light-cone between zmin and zmax over the sky box ra0 <= ra <=
+    ra1, dec0 <= dec <= dec1 (degrees), for one cosmology.
+
+    Object i always gets the same position for a given seed: the random
+    numbers come from independent streams of BLOCK objects each, keyed
+    by (seed, block), so the output does not depend on the chunk size
+    or on where a run starts."""
+
+    def __init__(self, zmin=0., zmax=1., ra=(0., 360.), dec=(-90., 90.),
+                 H0=H0_default, WM=WM_default, WV=None, WR=None, seed=0, nodes=1 << 14):
+        if not 0 <= zmin < zmax:
+            raise ValueError('need 0 <= zmin < zmax')
+        self.zmin, self.zmax = float(zmin), float(zmax)
+        self.ra = tuple(float(r) for r in ra)
+        self.dec = tuple(float(d) for d in dec)
+        self.seed = int(seed)
+        self.cosmo = Cosmology(H0, WM, WV, WR, zmax=max(1100., self.zmax))
+        # V**(1/3) is close to linear in distance, so linear interpolation
+        # of z against it stays accurate on a moderate grid
+        x = np.linspace(np.log1p(self.zmin), np.log1p(self.zmax), nodes)
+        self._z = np.expm1(x)
+        self._z[0], self._z[-1] = self.zmin, self.zmax
+        self._r = np.cbrt(volume(self._z, H0, WM, WV, WR))
+        self._r = np.maximum.accumulate(self._r)
+        self._s = np.sin(np.radians(self.dec))
+
+    @property
+    def area(self):
+        """Sky area of the box in square degrees."""
+        return (self.ra[1]-self.ra[0])*np.degrees(self._s[1]-self._s[0])
+
+    @property
+    def volume(self):
+        """Comoving volume of the light-cone in Gpc**3."""
+        return (self._r[-1]**3-self._r[0]**3)*self.area/FULL_SKY
+
+    def _uniforms(self, lo, hi):
+        # the (3, hi-lo) random numbers of objects lo to hi
+        out = np.empty((3, hi-lo))
+        for b in range(lo//BLOCK, (hi-1)//BLOCK+1):
+            u = np.random.default_rng([self.seed, b]).random((3, BLOCK))
+            s = max(lo, b*BLOCK)
+            e = min(hi, (b+1)*BLOCK)
+            out[:, s-lo:e-lo] = u[:, s-b*BLOCK:e-b*BLOCK]
+        return out
+
+    def objects(self, lo, hi):
+        """Objects lo to hi as a structured array with DTYPE."""
+        u = self._uniforms(lo, hi)
+        out = np.empty(hi-lo, dtype=DTYPE)
+        out['ra'] = self.ra[0]+(self.ra[1]-self.ra[0])*u[0]
+        out['dec'] = np.degrees(np.arcsin(self._s[0]+(self._s[1]-self._s[0])*u[1]))
+        v0, v1 = self._r[0]**3, self._r[-1]**3
+        z = np.interp(np.cbrt(v0+(v1-v0)*u[2]), self._r, self._z)
+        out['z'] = z
+        res = self.cosmo.batch(z)
+        out['DCMR_Mpc'] = res['DCMR_Mpc']
+        out['DL_Mpc'] = res['DL_Mpc']
+        return out
+
+    def chunks(self, count, chunk=CHUNK, start=0):
+        """Yield objects start to start+count in arrays of chunk rows."""
+        for lo in range(start, start+count, chunk):
+            yield self.objects(lo, min(lo+chunk, start+count))
+
+    def write(self, path, count, chunk=CHUNK):
+        """Stream count objects to a .npy file (memory mapped) or a CSV
+        file.  Returns the number of rows written."""
+        if str(path).endswith('.npy'):
+            out = np.lib.format.open_memmap(path, mode='w+', dtype=DTYPE, shape=(count,))
+            try:
+                for lo in range(0, count, chunk):
+                    hi = min(lo+chunk, count)
+                    out[lo:hi] = self.objects(lo, hi)
+                    out.flush()
+            finally:
+                del out
+        else:
+            line = ','.join(['%.8g']*len(COLUMNS)) + '\n'
+            with open(path, 'w') as f:
+                f.write(','.join(COLUMNS) + '\n')
+                for block in self.chunks(count, chunk):
+                    f.writelines(line % row for row in block.tolist())
+        return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mock light-cone uniform in comoving volume')
+    parser.add_argument('output', help='output .npy or .csv')
+    parser.add_argument('count', type=int, help='number of objects')
+    parser.add_argument('--zmin', type=float, default=0., help='lowest redshift')
+    parser.add_argument('--zmax', type=float, default=1., help='highest redshift')
+    parser.add_argument('--ra', type=float, nargs=2, default=(0., 360.), help='ra range in degrees')
+    parser.add_argument('--dec', type=float, nargs=2, default=(-90., 90.), help='dec range in degrees')
+    parser.add_argument('--H0', type=float, default=H0_default, help='Hubble constant')
+    parser.add_argument('--WM', type=float, default=WM_default, help='Omega(matter)')
+    parser.add_argument('--WV', type=float, default=None, help='Omega(vacuum), flat if omitted')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--chunk', type=int, default=CHUNK, help='objects per chunk')
+    args = parser.parse_args(argv)
+    cone = LightCone(args.zmin, args.zmax, args.ra, args.dec, args.H0, args.WM, args.WV,
+                     seed=args.seed)
+    n = cone.write(args.output, args.count, args.chunk)
+    print('%d objects in %.4g Gpc^3 written to %s' % (n, cone.volume, args.output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
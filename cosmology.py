@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+
+# Vectorized version of the cosmocalc.py calculator (Ned Wright's
+# cosmology calculator, Python version by James Schombert).
+# Every function takes NumPy arrays of redshift, and optionally arrays
+# of H0, WM and WV, and broadcasts them against each other so that a
+# whole galaxy catalog is done in a few array operations.
+
+import numpy as np
+
+# initialize constants
+
+c = 299792.458 # velocity of light in km/sec
+Tyr = 977.8    # coefficent for converting 1/H into Gyr
+n = 1000       # number of points in integrals
+
+# default cosmology, as hard-coded in cosmocalc.py
+
+H0_default = 69.6   # Hubble constant
+WM_default = 0.286  # Omega(matter)
+
+# output columns, named after the cosmocalc.py variables
+
+COLUMNS = ('age_Gyr', 'zage_Gyr', 'DTT_Gyr', 'DCMR_Mpc', 'DA_Mpc', 'kpc_DA',
+           'DL_Mpc', 'V_Gpc', 'distmod')
+
+CHUNK = 1 << 20  # array elements per block in the broadcast integrals
+
+
+def densities(H0=H0_default, WM=WM_default, WV=None, WR=None):
+    """Return (WM, WV, WR, WK) arrays completed as in cosmocalc.py.
+
+    WV defaults to a flat universe, WR to 3 massless neutrino species
+    with T0 = 2.72528, and WK is whatever is left over."""
+    H0 = np.asarray(H0, dtype=float)
+    WM = np.asarray(WM, dtype=float)
+    h = H0/100.
+    if WV is None:
+        WV = 1.0 - WM - 0.4165/(H0*H0)  # Omega(vacuum) or lambda
+    if WR is None:
+        WR = 4.165E-5/(h*h)   # Omega(radiation)
+    WV = np.asarray(WV, dtype=float)
+    WR = np.asarray(WR, dtype=float)
+    WK = 1-WM-WR-WV       # Omega curvaturve = 1-Omega(total)
+    return WM, WV, WR, WK
+
+
+def adot(a, WM, WV, WR, WK):
+    """da/dt in units of H0, the integrand kernel of every distance."""
+    return np.sqrt(WK+(WM/a)+(WR/(a*a))+(WV*a*a))
+
+
+def _rsqrt(a, WM, WV, WR, WK):
+    # 1/(a*adot) = 1/sqrt(WR + WM*a + WK*a**2 + WV*a**4), written with a
+    # single sqrt and divide so the large grids stay cheap
+    q = WV*a
+    q *= a
+    q += WK
+    q *= a
+    q += WM
+    q *= a
+    q += WR
+    np.sqrt(q, out=q)
+    return np.reciprocal(q, out=q)
+
+
+def midpoint(az, WM, WV, WR, WK, n=n):
+    """The two cosmocalc.py midpoint integrals for 1-d arrays.
+
+    Returns (zage, DTT, DCMR) in units of 1/H0 and c/H0.  The work is
+    done in blocks of rows so that the (objects x n) grids stay within
+    CHUNK elements."""
+    zage = np.empty_like(az)
+    DTT = np.empty_like(az)
+    DCMR = np.empty_like(az)
+    t = (np.arange(n)+0.5)/n
+    step = max(1, CHUNK//n)
+    for lo in range(0, az.size, step):
+        s = slice(lo, lo+step)
+        p = [w[s, None] for w in (WM, WV, WR, WK)]
+        azs = az[s, None]
+        # integral over a from 0 to az
+        a = azs*t
+        zage[s] = az[s]*np.einsum('ij,ij->i', a, _rsqrt(a, *p))/n
+        # integral over a=1/(1+z) from az to 1
+        a = azs+(1-azs)*t
+        r = _rsqrt(a, *p)
+        DTT[s] = (1.-az[s])*np.einsum('ij,ij->i', a, r)/n
+        DCMR[s] = (1.-az[s])*np.sum(r, axis=1)/n
+    return zage, DTT, DCMR
+
+
+def _scalar(H0, WM, WV, WR):
+    # the single-cosmology paths need every parameter to be a scalar
+    if any(np.ndim(w) for w in (H0, WM, WV, WR)):
+        raise ValueError('expected a single cosmology, got arrays of parameters')
+    WM, WV, WR, WK = densities(H0, WM, WV, WR)
+    return float(H0), (float(WM), float(WV), float(WR), float(WK))
+
+
+def cumulative(z, H0=H0_default, WM=WM_default, WV=None, WR=None, n=n):
+    """Integrals for many redshifts of one cosmology in a single sweep.
+
+    The integrands are evaluated once on a grid of n Simpson intervals,
+    uniform in ln(a) from the smallest az to 1, and accumulated with a
+    cumulative sum.  Each object then only needs the partial interval
+    between the grid node below it and its own az, so m redshifts cost
+    O(n+m) integrand calls instead of O(n*m).  Since the grid is uniform
+    the node below each object is found arithmetically and z need not
+    be sorted.  Returns (zage, DTT, DCMR) with the shape of z."""
+    H0, p = _scalar(H0, WM, WV, WR)
+    return sweep(z, lambda a: _rsqrt(a, *p), n)
+
+
+def sweep(z, rsqrt, n=n):
+    """cumulative() for any kernel rsqrt(a) = 1/(a*adot), in units of H0.
+
+    Redshifts that are nan, infinite or at most -1 give nan, and do not
+    take part in the grid."""
+    z = np.asarray(z, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        az = 1.0/(1+z.ravel())
+    valid = np.isfinite(az) & (az > 0)
+    # a harmless stand-in for the invalid ones
+    az = np.where(valid, az, 1.)
+    x0 = min(np.log(az.min()), -1e-3) if az.size else -1e-3
+    h = -x0/n
+    # Simpson nodes and midpoints; in x = ln(a), da = a*dx
+    a = np.exp(x0 + 0.5*h*np.arange(2*n+1))
+    fc = a*rsqrt(a)          # dDCMR/dx
+    ft = a*fc                # dt/dx
+
+    def cum(f):
+        return np.concatenate(([0.], np.cumsum(h/6.*(f[:-1:2]+4*f[1::2]+f[2::2]))))
+
+    Ct = cum(ft)
+    Cc = cum(fc)
+
+    # partial interval from the node below each object up to its az
+    xz = np.log(az)
+    j = np.clip(np.floor((xz-x0)/h).astype(int), 0, n-1)
+    xj = x0+h*j
+    dx = xz-xj
+    am = np.exp(xj+0.5*dx)
+    rm = am*rsqrt(am)
+    rz = az*rsqrt(az)
+    Ic = Cc[j] + dx/6.*(fc[2*j] + 4*rm + rz)
+    It = Ct[j] + dx/6.*(ft[2*j] + 4*am*rm + az*rz)
+
+    # age at the start of the grid, midpoint rule from a=0 as cosmocalc.py does
+    a0 = np.exp(x0)
+    t = a0*(np.arange(n)+0.5)/n
+    zage0 = a0*np.sum(t*rsqrt(t))/n
+
+    zage = zage0+It
+    DTT = Ct[-1]-It
+    DCMR = Cc[-1]-Ic
+    for x in (zage, DTT, DCMR):
+        x[~valid] = np.nan
+    return tuple(x.reshape(z.shape) for x in (zage, DTT, DCMR))
+
+
+def batch_cumulative(z, H0=H0_default, WM=WM_default, WV=None, WR=None, n=n):
+    """batch() for many redshifts of one cosmology, using cumulative()."""
+    zage, DTT, DCMR = cumulative(z, H0, WM, WV, WR, n)
+    WK = densities(H0, WM, WV, WR)[3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        az = 1.0/(1+np.asarray(z, dtype=float))
+        return finish(az, zage, DTT, DCMR, float(H0), WK)
+
+
+# Gauss-Kronrod 7-15 point rule on [-1,1] (from QUADPACK); the Gauss
+# points are the odd-numbered Kronrod nodes
+
+_XGK = np.array([0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+                 0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+                 0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+                 0.207784955007898467600689403773245, 0.000000000000000000000000000000000])
+_WGK = np.array([0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+                 0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+                 0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+                 0.204432940075298892414161999234649, 0.209482141084727828012999174891714])
+_WG = np.array([0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+                0.381830050505118944950369775488975, 0.417959183673469387755102040816327])
+
+_XK = np.concatenate((-_XGK[:-1], _XGK[::-1]))
+_WK = np.concatenate((_WGK[:-1], _WGK[::-1]))
+_WGfull = np.zeros(15)
+_WGfull[1:7:2] = _WG[:3]
+_WGfull[7] = _WG[3]
+_WGfull[9:15:2] = _WG[2::-1]
+
+
+def gauss_kronrod(f, lo, hi, rtol=1e-8, atol=0., depth=50):
+    """Adaptive Gauss-Kronrod quadrature of many integrals at once.
+
+    f(x, k) evaluates the integrand at the points x of integrals k,
+    where k indexes lo and hi.  Every round evaluates the 15 point rule
+    on all open intervals in one call, keeps the ones whose |K15 - G7|
+    is within their share of max(rtol*|I|, atol), and bisects the rest,
+    so easy integrals finish after a single rule and hard ones get
+    refined only where needed.  Intervals still open after depth
+    bisections are accepted with whatever error they have.  Integrals
+    with non-finite limits or integrand values are not refined; they
+    come out nan.
+
+    Returns (value, error, neval) arrays with one entry per integral."""
+    lo, hi = [np.array(x, dtype=float).ravel() for x in np.broadcast_arrays(lo, hi)]
+    m = lo.size
+    value = np.zeros(m)
+    error = np.zeros(m)
+    neval = np.zeros(m, dtype=int)
+    bad = np.zeros(m, dtype=bool)
+    width = hi-lo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(width != 0, 1./width, 0.)
+    # the open intervals, and the integral each belongs to
+    a, b, k = lo, hi, np.arange(m)
+    for level in range(depth+1):
+        if not k.size:
+            break
+        mid = 0.5*(a+b)
+        half = 0.5*(b-a)
+        fx = f(mid[:, None]+half[:, None]*_XK, k[:, None])
+        K = half*(fx @ _WK)
+        err = np.abs(K-half*(fx @ _WGfull))
+        np.add.at(neval, k, 15)
+        # current estimate of each whole integral
+        total = value.copy()
+        np.add.at(total, k, K)
+        tol = np.maximum(rtol*np.abs(total), atol)[k]*np.abs(b-a)*scale[k]
+        # a nan or inf error never shrinks by bisection, and makes the
+        # tolerance of the other intervals of its integral nan as well
+        bad[k[~np.isfinite(err)]] = True
+        done = (err <= tol) | bad[k] | (level == depth)
+        np.add.at(value, k[done], K[done])
+        np.add.at(error, k[done], err[done])
+        a, b, k, mid = a[~done], b[~done], k[~done], mid[~done]
+        a, b, k = np.concatenate((a, mid)), np.concatenate((mid, b)), np.concatenate((k, k))
+    value[bad] = np.nan
+    error[bad] = np.nan
+    return value, error, neval
+
+
+def adaptive(z, H0=H0_default, WM=WM_default, WV=None, WR=None, rtol=1e-8):
+    """The cosmocalc.py integrals by adaptive quadrature to a relative
+    tolerance rtol.
+
+    Returns ((zage, DTT, DCMR), (zage_err, DTT_err, DCMR_err)), each
+    with the broadcast shape of the inputs, in units of 1/H0 and c/H0."""
+    shape, (z, H0, WM, WV, WR, WK) = _broadcast(z, H0, WM, WV, WR)
+    az = 1.0/(1+z)
+    p = (WM, WV, WR, WK)
+
+    def dt(a, k):
+        return a*_rsqrt(a, *[w[k] for w in p])
+
+    def dr(a, k):
+        return _rsqrt(a, *[w[k] for w in p])
+
+    zage, zage_err, _ = gauss_kronrod(dt, 0., az, rtol)
+    DTT, DTT_err, _ = gauss_kronrod(dt, az, 1., rtol)
+    DCMR, DCMR_err, _ = gauss_kronrod(dr, az, 1., rtol)
+    values = tuple(x.reshape(shape) for x in (zage, DTT, DCMR))
+    errors = tuple(x.reshape(shape) for x in (zage_err, DTT_err, DCMR_err))
+    return values, errors
+
+
+def batch_adaptive(z, H0=H0_default, WM=WM_default, WV=None, WR=None, rtol=1e-8):
+    """batch() with adaptive quadrature in place of the midpoint rule.
+
+    Returns (out, err): the usual output columns, and the error
+    estimates of zage_Gyr, DTT_Gyr and DCMR_Mpc in the same units."""
+    (zage, DTT, DCMR), errors = adaptive(z, H0, WM, WV, WR, rtol)
+    shape, (z, H0, WM, WV, WR, WK) = _broadcast(z, H0, WM, WV, WR)
+    az = 1.0/(1+z)
+    out = finish(az, zage.ravel(), DTT.ravel(), DCMR.ravel(), H0, WK)
+    out = {k: v.reshape(shape) for k, v in out.items()}
+    H0 = H0.reshape(shape)
+    err = {'zage_Gyr': (Tyr/H0)*errors[0],
+           'DTT_Gyr': (Tyr/H0)*errors[1],
+           'DCMR_Mpc': (c/H0)*errors[2]}
+    return out, err
+
+
+def carlson_rf(x, y, z):
+    """Carlson's symmetric elliptic integral of the first kind R_F(x,y,z),
+    by the duplication theorem, for arrays."""
+    x, y, z = [np.array(w, dtype=float) for w in np.broadcast_arrays(x, y, z)]
+    for i in range(40):
+        mu = (x+y+z)/3.
+        if not x.size or max(np.max(np.abs(mu-w)/mu) for w in (x, y, z)) < 2e-3:
+            break
+        sx, sy, sz = np.sqrt(x), np.sqrt(y), np.sqrt(z)
+        lam = sx*sy+sx*sz+sy*sz
+        x = 0.25*(x+lam)
+        y = 0.25*(y+lam)
+        z = 0.25*(z+lam)
+    mu = (x+y+z)/3.
+    X = 1.-x/mu
+    Y = 1.-y/mu
+    Z = -X-Y
+    E2 = X*Y-Z*Z
+    E3 = X*Y*Z
+    return (1.-E2/10.+E3/14.+E2*E2/24.-3.*E2*E3/44.)/np.sqrt(mu)
+
+
+# Legendre form of the integral of 1/sqrt(t**3+1), Abramowitz & Stegun
+# 17.4.70, with modulus k = sin(75 deg)
+
+_R3 = np.sqrt(3.)
+_K2 = (2.+_R3)/4.
+_KK = float(carlson_rf(0., 1.-_K2, 1.))
+
+
+def _cubic(x, b):
+    # integral of dt/sqrt(t**3+b**3) from -b to x
+    cp = ((_R3-1.)*b-x)/((_R3+1.)*b+x)
+    s2 = 1.-cp*cp
+    F = np.sqrt(s2)*carlson_rf(cp*cp, 1.-_K2*s2, 1.)
+    F = np.where(cp >= 0, F, 2.*_KK-F)
+    return F/(3.**0.25*np.sqrt(b))
+
+
+def flat_age(a, WM, WV):
+    """Age at scale factor a of a flat matter + lambda universe (WV > 0),
+    in units of 1/H0."""
+    return 2./(3.*np.sqrt(WV))*np.arcsinh(np.sqrt(WV/WM)*a**1.5)
+
+
+def flat_dcmr(z, WM, WV):
+    """Comoving radial distance to z in a flat matter + lambda universe
+    (WV > 0), in units of c/H0, through Carlson's R_F."""
+    b = np.cbrt(WV/WM)
+    return (_cubic(1.+z, b)-_cubic(1., b))/np.sqrt(WM)
+
+
+def flat_error(az, WM, WR):
+    """Relative errors of (zage, DTT, DCMR) made by dropping WR.
+
+    These are the size of the radiation term in a matter + radiation
+    universe, which can only overestimate its effect once lambda is
+    added, so they serve as a bound."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        def dt(a):
+            # t(matter + radiation) - t(matter)
+            return (2./(3.*WM*WM))*((WM*a-2.*WR)*np.sqrt(WR+WM*a)+2.*WR**1.5) \
+                - (2./3.)*a**1.5/np.sqrt(WM)
+
+        def dr(a):
+            return (2./WM)*(np.sqrt(WR+WM*a)-np.sqrt(WM*a))
+
+        t0 = (2./3.)*az**1.5/np.sqrt(WM)
+        t1 = (2./3.)/np.sqrt(WM)
+        zage = np.abs(dt(az))/t0
+        DTT = np.abs(dt(1.)-dt(az))/(t1-t0)
+        DCMR = np.abs(dr(1.)-dr(az))*np.sqrt(WM)/(2.*(1.-np.sqrt(az)))
+    return zage, DTT, DCMR
+
+
+def flat(z, H0=H0_default, WM=WM_default, WV=None, WR=None, rtol=1e-3):
+    """The cosmocalc.py integrals with the flat lambda-CDM closed forms.
+
+    Objects whose cosmology is flat (|WK| <= rtol, WV > 0) and whose
+    radiation term is negligible (flat_error() <= rtol) get the closed
+    forms, an arcsinh for the age and an elliptic integral for DCMR,
+    with no integration at all.  Everything else, including z < 1e-4
+    where the DCMR difference would lose digits, falls back to
+    adaptive() at the same rtol.  The default WR from cosmocalc.py
+    changes the present age by a few parts in 10**4; pass WR=0 to use
+    the closed forms exactly.
+
+    Returns ((zage, DTT, DCMR), fast) where fast marks the objects that
+    took the closed forms."""
+    shape, (z, H0, WM, WV, WR, WK) = _broadcast(z, H0, WM, WV, WR)
+    az = 1.0/(1+z)
+    fast = (np.abs(WK) <= rtol) & (WV > 0) & (WM > 0) & (z >= 1e-4)
+    fast &= np.all(np.array(flat_error(az, WM, WR)) <= rtol, axis=0)
+    zage = np.empty_like(z)
+    DTT = np.empty_like(z)
+    DCMR = np.empty_like(z)
+    f = fast
+    if f.any():
+        zage[f] = flat_age(az[f], WM[f], WV[f])
+        DTT[f] = flat_age(1., WM[f], WV[f])-zage[f]
+        DCMR[f] = flat_dcmr(z[f], WM[f], WV[f])
+    f = ~fast
+    if f.any():
+        (zage[f], DTT[f], DCMR[f]), _ = adaptive(z[f], H0[f], WM[f], WV[f], WR[f], rtol)
+    return tuple(x.reshape(shape) for x in (zage, DTT, DCMR)), fast.reshape(shape)
+
+
+def batch_flat(z, H0=H0_default, WM=WM_default, WV=None, WR=None, rtol=1e-3):
+    """batch() through flat(), for mostly flat lambda-CDM queries."""
+    (zage, DTT, DCMR), fast = flat(z, H0, WM, WV, WR, rtol)
+    shape, (z, H0, WM, WV, WR, WK) = _broadcast(z, H0, WM, WV, WR)
+    out = finish(1.0/(1+z), zage.ravel(), DTT.ravel(), DCMR.ravel(), H0, WK)
+    return {k: v.reshape(shape) for k, v in out.items()}
+
+
+def _sinn(x, WK, small, big_open, big_closed, series):
+    # the curvature correction used twice by cosmocalc.py: a closed
+    # form for x > 0.1 and a series expansion below it
+    y = x*x
+    y = np.where(WK < 0, -y, y)
+    with np.errstate(all='ignore'):
+        ratio = np.where(WK > 0, big_open(x), big_closed(x))
+    return np.where(x > small, ratio, series(y))
+
+
+def transverse_ratio(x, WK):
+    """DCMT/DCMR for x = sqrt(|WK|)*DCMR."""
+    return _sinn(x, WK, 0.1,
+                 lambda x: 0.5*(np.exp(x)-np.exp(-x))/x,
+                 lambda x: np.sin(x)/x,
+                 lambda y: 1. + y/6. + y*y/120.)
+
+
+def volume_ratio(x, WK):
+    """VCM/(DCMR**3/3) for x = sqrt(|WK|)*DCMR."""
+    return _sinn(x, WK, 0.1,
+                 lambda x: (0.125*(np.exp(2.*x)-np.exp(-2.*x))-x/2.)/(x*x*x/3.),
+                 lambda x: (x/2. - np.sin(2.*x)/4.)/(x*x*x/3.),
+                 lambda y: 1. + y/5. + (2./105.)*y*y)
+
+
+def finish(az, zage, DTT, DCMR, H0, WK):
+    """Turn the integrals into the cosmocalc.py output columns."""
+    x = np.sqrt(np.abs(WK))*DCMR
+    DCMT = transverse_ratio(x, WK)*DCMR
+    DA = az*DCMT
+    DL = DA/(az*az)
+    VCM = volume_ratio(x, WK)*DCMR*DCMR*DCMR/3.
+    out = {}
+    out['age_Gyr'] = (Tyr/H0)*(DTT+zage)
+    out['zage_Gyr'] = (Tyr/H0)*zage
+    out['DTT_Gyr'] = (Tyr/H0)*DTT
+    out['DCMR_Mpc'] = (c/H0)*DCMR
+    out['DA_Mpc'] = (c/H0)*DA
+    out['kpc_DA'] = out['DA_Mpc']/206.264806
+    out['DL_Mpc'] = (c/H0)*DL
+    out['V_Gpc'] = 4.*np.pi*((0.001*c/H0)**3)*VCM
+    with np.errstate(divide='ignore'):
+        out['distmod'] = 5*np.log10(out['DL_Mpc']*1e6)-5
+    return out
+
+
+def _broadcast(z, H0, WM, WV, WR):
+    # broadcast the inputs and flatten them for the 1-d kernels
+    WM, WV, WR, WK = densities(H0, WM, WV, WR)
+    arrays = np.broadcast_arrays(np.asarray(z, dtype=float), H0, WM, WV, WR, WK)
+    shape = arrays[0].shape
+    return shape, [np.ascontiguousarray(x, dtype=float).ravel() for x in arrays]
+
+
+def batch(z, H0=H0_default, WM=WM_default, WV=None, WR=None, n=n):
+    """cosmocalc.py for arrays.
+
+    z, H0, WM, WV and WR broadcast against each other; WV and WR get
+    the cosmocalc.py defaults when None.  Returns a dict of arrays with
+    the broadcast shape, keyed by COLUMNS."""
+    shape, (z, H0, WM, WV, WR, WK) = _broadcast(z, H0, WM, WV, WR)
+    az = 1.0/(1+z)
+    zage, DTT, DCMR = midpoint(az, WM, WV, WR, WK, n)
+    out = finish(az, zage, DTT, DCMR, H0, WK)
+    return {k: v.reshape(shape) for k, v in out.items()}
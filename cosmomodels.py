@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+# Expansion histories beyond the cosmocalc.py kernel.
+# cosmocalc.py integrates adot = sqrt(WK + WM/a + WR/(a*a) + WV*a*a),
+# a cosmological constant with massless neutrinos.  A Model here
+# supplies the same kernel for w0-wa dark energy and for neutrinos with
+# mass, and runs it through the usual cumulative sweep.  The massive
+# neutrino density needs a momentum integral at every a; it comes from
+# one table of that integral, built on first use and shared by every
+# Model, so a kernel call costs an interpolation rather than a
+# quadrature.
+
+from functools import lru_cache
+
+import numpy as np
+
+from cosmology import H0_default, WM_default, n, sweep, gauss_kronrod, finish
+
+# cosmocalc.py's radiation density 4.165E-5/h**2 is photons plus three
+# massless neutrino species, each worth 7/8*(4/11)**(4/3) of the photons
+NU_FRAC = 7./8.*(4./11.)**(4./3.)
+WG_H2 = 4.165E-5/(1.+3.*NU_FRAC)  # Omega(photons)*h**2
+
+T0 = 2.72528                   # CMB temperature in K
+kB = 8.617333262E-5            # Boltzmann constant in eV/K
+
+# F(y) = integral of x**2*sqrt(x**2+y**2)/(exp(x)+1), normalised to
+# F(0) = 1, is the energy density of one neutrino species with
+# y = m*a/(kB*T_nu) relative to a massless one; it is tabulated in
+# ln(y) between these bounds
+Y_MIN, Y_MAX, Y_NODES = 1e-4, 1e5, 1024
+
+_F_NORM = 7.*np.pi**4/120.
+
+
+@lru_cache(maxsize=None)
+def _nu_table():
+    # ln F and d(ln F)/d(ln y) on a uniform grid in ln y
+    ly = np.linspace(np.log(Y_MIN), np.log(Y_MAX), Y_NODES)
+    y = np.exp(ly)
+
+    def f(x, k):
+        return x*x*np.sqrt(x*x+y[k]*y[k])/(np.exp(x)+1.)
+
+    def df(x, k):
+        return x*x*y[k]/(np.sqrt(x*x+y[k]*y[k])*(np.exp(x)+1.))
+
+    F, _, _ = gauss_kronrod(f, 0., np.full(y.size, 60.), rtol=1e-12)
+    dF, _, _ = gauss_kronrod(df, 0., np.full(y.size, 60.), rtol=1e-12)
+    h = ly[1]-ly[0]
+    return ly[0], h, np.log(F/_F_NORM), y*dF/F*h
+
+
+def nu_density(y):
+    """F(y), the energy density of a neutrino species with y =
+    m*a/(kB*T_nu) over that of a massless one, interpolated from the
+    cached table by cubic Hermite splines in ln(y)."""
+    y = np.asarray(y, dtype=float)
+    x0, h, lF, dlF = _nu_table()
+    x = (np.log(np.clip(y, Y_MIN, Y_MAX))-x0)/h
+    i = np.clip(x.astype(int), 0, lF.size-2)
+    t = x-i
+    t2 = t*t
+    t3 = t2*t
+    F = np.exp((2*t3-3*t2+1)*lF[i]+(t3-2*t2+t)*dlF[i]+(-2*t3+3*t2)*lF[i+1]+(t3-t2)*dlF[i+1])
+    # beyond the table a species is fully relativistic or fully matter-like
+    return np.where(y > Y_MAX, F*y/Y_MAX, np.where(y < Y_MIN, 1., F))
+
+
+class Model(object):
+    """A cosmological constant universe with massless or massive
+    neutrinos.
+
+    WM is cold dark matter plus baryons.  m_nu lists the masses in eV
+    of the massive species; the rest of the Neff species are massless.
+    WV defaults to a flat universe.  With no massive neutrinos and
+    Neff = 3 the kernel is exactly the cosmocalc.py one.
+
+    Subclasses change the dark energy by overriding de(a), its density
+    relative to today."""
+
+    def __init__(self, H0=H0_default, WM=WM_default, WV=None, m_nu=(), Neff=3., T0=T0):
+        self.H0 = float(H0)
+        self.WM = float(WM)
+        self.m_nu = tuple(float(m) for m in m_nu)
+        if len(self.m_nu) > Neff:
+            raise ValueError('more massive neutrinos than Neff species')
+        h = self.H0/100.
+        self.WG = WG_H2/(h*h)*(T0/2.72528)**4
+        self.Neff = float(Neff)
+        self._y = np.array(self.m_nu)/(kB*T0*(4./11.)**(1./3.))
+        self.WN = float(self.nu(1.))
+        self.WV = 1.0-self.WM-self.WG-self.WN if WV is None else float(WV)
+        self.WK = 1.0-self.WM-self.WG-self.WN-self.WV
+
+    def __repr__(self):
+        return '%s(H0=%r, WM=%r, WV=%r, m_nu=%r)' % (
+            type(self).__name__, self.H0, self.WM, self.WV, self.m_nu)
+
+    def nu(self, a):
+        """Neutrino density times a**4, relative to the critical density
+        today."""
+        a = np.asarray(a, dtype=float)
+        massless = self.Neff-len(self.m_nu)
+        F = massless + sum(nu_density(y*a) for y in self._y)
+        return self.WG*NU_FRAC*F
+
+    def de(self, a):
+        """Dark energy density at a relative to today."""
+        return np.ones_like(a)
+
+    def rsqrt(self, a):
+        """1/(a*adot), the kernel of every distance, in units of H0."""
+        a = np.asarray(a, dtype=float)
+        a2 = a*a
+        q = self.WG+self.nu(a)+self.WM*a+self.WK*a2+self.WV*self.de(a)*a2*a2
+        return 1./np.sqrt(q)
+
+    def E(self, z):
+        """H(z)/H0."""
+        a = 1.0/(1+np.asarray(z, dtype=float))
+        return 1./(a*a*self.rsqrt(a))
+
+    def integrals(self, z, n=n):
+        """(zage, DTT, DCMR) at z in units of 1/H0 and c/H0, from one
+        cumulative sweep."""
+        return sweep(z, self.rsqrt, n)
+
+    def adaptive(self, z, rtol=1e-8):
+        """integrals() by adaptive quadrature, for checking."""
+        z = np.asarray(z, dtype=float)
+        az = 1.0/(1+z.ravel())
+
+        def dt(a, k):
+            return a*self.rsqrt(a)
+
+        def dr(a, k):
+            return self.rsqrt(a)
+
+        zage, _, _ = gauss_kronrod(dt, 0., az, rtol)
+        DTT, _, _ = gauss_kronrod(dt, az, 1., rtol)
+        DCMR, _, _ = gauss_kronrod(dr, az, 1., rtol)
+        return tuple(x.reshape(z.shape) for x in (zage, DTT, DCMR))
+
+    def batch(self, z, n=n):
+        """cosmology.batch() for this model."""
+        zage, DTT, DCMR = self.integrals(z, n)
+        az = 1.0/(1+np.asarray(z, dtype=float))
+        return finish(az, zage, DTT, DCMR, self.H0, self.WK)
+
+    __call__ = batch
+
+
+class W0WaModel(Model):
+    """Dark energy with equation of state w(a) = w0 + wa*(1-a)."""
+
+    def __init__(self, H0=H0_default, WM=WM_default, WV=None, w0=-1., wa=0.,
+                 m_nu=(), Neff=3., T0=T0):
+        self.w0 = float(w0)
+        self.wa = float(wa)
+        Model.__init__(self, H0, WM, WV, m_nu, Neff, T0)
+
+    def __repr__(self):
+        return 'W0WaModel(H0=%r, WM=%r, WV=%r, w0=%r, wa=%r, m_nu=%r)' % (
+            self.H0, self.WM, self.WV, self.w0, self.wa, self.m_nu)
+
+    def de(self, a):
+        return a**(-3.*(1.+self.w0+self.wa))*np.exp(-3.*self.wa*(1.-a))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# Parameter-grid sweeps of the cosmology calculator on a process pool.
+# The fixed redshift array and the (params x z) result cube live in
+# shared memory, so workers read z and write their rows in place and
+# only the parameter blocks travel through the pool.  Each parameter
+# set is done with one cumulative() sweep over all the redshifts.
+
+import os
+import time
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from cosmology import batch_cumulative
+
+BLOCK = 16  # parameter sets per task
+
+_shared = {}
+
+
+def grid(H0, WM, WV):
+    """All combinations of the given H0, WM and WV values as a
+    (len(H0)*len(WM)*len(WV), 3) array of parameter sets."""
+    mesh = np.meshgrid(np.atleast_1d(H0), np.atleast_1d(WM), np.atleast_1d(WV), indexing='ij')
+    return np.stack([m.ravel() for m in mesh], axis=1).astype(float)
+
+
+def _attach(zname, zsize, oname, oshape):
+    # pool initializer: map the shared redshifts and result cube
+    zshm = shared_memory.SharedMemory(name=zname)
+    oshm = shared_memory.SharedMemory(name=oname)
+    _shared['shm'] = (zshm, oshm)
+    _shared['z'] = np.ndarray((zsize,), dtype=float, buffer=zshm.buf)
+    _shared['out'] = np.ndarray(oshape, dtype=float, buffer=oshm.buf)
+
+
+def _work(task):
+    lo, params, column, n = task
+    z, out = _shared['z'], _shared['out']
+    for i, (H0, WM, WV) in enumerate(params):
+        out[lo+i] = batch_cumulative(z, H0, WM, WV, n=n)[column]
+    return lo, len(params)
+
+
+def _save(path, out, done, params, z):
+    tmp = path+'.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, out=out, done=done, params=params, z=z)
+    os.replace(tmp, path)
+
+
+def sweep(z, params, column='distmod', workers=None, block=BLOCK, n=1000,
+          checkpoint=None, every=60., progress=None):
+    """Evaluate column at every redshift for every parameter set.
+
+    params is a (P, 3) array of (H0, WM, WV) rows, see grid().  Returns
+    the (P, len(z)) result cube.  The work is split into blocks of
+    parameter sets across a pool of workers (all cores by default).
+
+    progress(done, total) is called in this process as blocks finish.
+    With checkpoint, the partial cube is saved to that .npz file every
+    `every` seconds and at the end, and a later call with the same file,
+    redshifts and parameters resumes where it stopped."""
+    z = np.ascontiguousarray(z, dtype=float).ravel()
+    params = np.asarray(params, dtype=float).reshape(-1, 3)
+    P = len(params)
+    shape = (P, z.size)
+
+    done = np.zeros(P, dtype=bool)
+    start = None
+    if checkpoint and os.path.exists(checkpoint):
+        with np.load(checkpoint) as old:
+            if np.array_equal(old['params'], params) and np.array_equal(old['z'], z):
+                done = old['done'].copy()
+                start = old['out']
+
+    zshm = shared_memory.SharedMemory(create=True, size=max(z.nbytes, 1))
+    oshm = shared_memory.SharedMemory(create=True, size=max(P*z.size*8, 1))
+    try:
+        np.ndarray(z.shape, dtype=float, buffer=zshm.buf)[:] = z
+        out = np.ndarray(shape, dtype=float, buffer=oshm.buf)
+        out[:] = np.nan if start is None else start
+
+        todo = np.flatnonzero(~done)
+        tasks = []
+        for i in range(0, todo.size, block):
+            # contiguous runs of unfinished rows
+            rows = todo[i:i+block]
+            for run in np.split(rows, np.flatnonzero(np.diff(rows) != 1)+1):
+                tasks.append((int(run[0]), params[run], column, n))
+
+        count = int(done.sum())
+        if progress:
+            progress(count, P)
+        saved = time.time()
+        with Pool(workers, initializer=_attach,
+                  initargs=(zshm.name, z.size, oshm.name, shape)) as pool:
+            for lo, k in pool.imap_unordered(_work, tasks):
+                done[lo:lo+k] = True
+                count += k
+                if progress:
+                    progress(count, P)
+                if checkpoint and time.time()-saved > every:
+                    _save(checkpoint, out, done, params, z)
+                    saved = time.time()
+        if checkpoint:
+            _save(checkpoint, out, done, params, z)
+        result = out.copy()
+    finally:
+        # drop the views before closing the shared blocks
+        out = None
+        zshm.close()
+        zshm.unlink()
+        oshm.close()
+        oshm.unlink()
+    return result
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+# Interpolation tables for the cosmocalc.py integrals.
+# A Cosmology holds one (H0, WM, WV, WR) parameter set and answers
+# queries from dense tables of zage, DTT and DCMR against x = ln(1+z).
+# The tables are built once per parameter set, on first use, and kept
+# in a process-wide LRU cache with a bound on the memory they take.
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from cosmology import (H0_default, WM_default, densities, cumulative, adaptive,
+                       finish, _rsqrt)
+
+cache_bytes = 64 << 20  # memory budget of the table cache
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class Tables(object):
+    """zage, DTT and DCMR, and their derivatives, on a uniform grid in
+    x = ln(1+z) from 0 to ln(1+zmax), interpolated by cubic Hermite
+    splines.  The derivatives are exact, from the integrand itself, so
+    the interpolation error is O(h**4) and max_error gives the largest
+    relative error of each integral measured at the interval midpoints
+    when the table was built."""
+
+    def __init__(self, WM, WV, WR, WK, zmax, nodes):
+        p = (WM, WV, WR, WK)
+        self.zmax = zmax
+        self.h = np.log1p(zmax)/(nodes-1)
+        x = self.h*np.arange(nodes)
+        z = np.expm1(x)
+        # a cosmology without a big bang has no real adot over part of
+        # the range, and nan tables there
+        with np.errstate(invalid='ignore'):
+            zage, DTT, DCMR = cumulative(z, 100., WM, WV, WR, n=16*nodes)
+            a = np.exp(-x)
+            r = a*_rsqrt(a, *p)  # 1/adot
+        self.y = np.array([zage, DTT, DCMR])
+        self.dy = np.array([-a*r, a*r, r])*self.h
+
+        # check the splines half way between the nodes
+        zm = np.expm1(x[:-1]+0.5*self.h)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ref, _ = adaptive(zm, 100., WM, WV, WR, rtol=1e-11)
+            got = self(zm)
+            errors = [np.abs(g/f-1) for g, f in zip(got, ref)]
+        # nan, without nanmax's warning, if the whole table is
+        self.max_error = tuple(float(np.nanmax(e)) if np.isfinite(e).any() else np.nan
+                               for e in errors)
+        self.nbytes = self.y.nbytes+self.dy.nbytes
+
+    def __call__(self, z):
+        """(zage, DTT, DCMR) at z, which must lie within [0, zmax]."""
+        x = np.log1p(z)/self.h
+        i = np.clip(x.astype(int), 0, self.y.shape[1]-2)
+        t = x-i
+        t2 = t*t
+        t3 = t2*t
+        h00 = 2*t3-3*t2+1
+        h10 = t3-2*t2+t
+        h01 = -2*t3+3*t2
+        h11 = t3-t2
+        y, dy = self.y, self.dy
+        return tuple(h00*y[k, i]+h10*dy[k, i]+h01*y[k, i+1]+h11*dy[k, i+1] for k in range(3))
+
+
+def tables(WM, WV, WR, WK, zmax=1100., nodes=4096):
+    """The Tables of a parameter set, from the cache or newly built.
+
+    The least recently used tables are dropped once the cache holds
+    more than cache_bytes."""
+    key = (WM, WV, WR, WK, zmax, nodes)
+    with _lock:
+        t = _cache.get(key)
+        if t is not None:
+            _cache.move_to_end(key)
+            return t
+    t = Tables(WM, WV, WR, WK, zmax, nodes)
+    with _lock:
+        _cache[key] = t
+        _cache.move_to_end(key)
+        while len(_cache) > 1 and sum(v.nbytes for v in _cache.values()) > cache_bytes:
+            _cache.popitem(last=False)
+    return t
+
+
+def cache_clear():
+    with _lock:
+        _cache.clear()
+
+
+class Cosmology(object):
+    """One cosmocalc.py parameter set, answering batch() queries from
+    cached interpolation tables.
+
+    Redshifts beyond zmax are integrated directly with adaptive()."""
+
+    def __init__(self, H0=H0_default, WM=WM_default, WV=None, WR=None,
+                 zmax=1100., nodes=4096):
+        self.H0 = float(H0)
+        WM, WV, WR, WK = densities(H0, WM, WV, WR)
+        self.WM, self.WV, self.WR, self.WK = float(WM), float(WV), float(WR), float(WK)
+        self.zmax = float(zmax)
+        self.nodes = int(nodes)
+
+    def __repr__(self):
+        return 'Cosmology(H0=%r, WM=%r, WV=%r, WR=%r)' % (self.H0, self.WM, self.WV, self.WR)
+
+    @property
+    def tables(self):
+        return tables(self.WM, self.WV, self.WR, self.WK, self.zmax, self.nodes)
+
+    @property
+    def max_error(self):
+        """Largest relative interpolation error of (zage, DTT, DCMR)."""
+        return self.tables.max_error
+
+    def integrals(self, z):
+        """(zage, DTT, DCMR) at z in units of 1/H0 and c/H0; nan for
+        redshifts that are nan, infinite or at most -1."""
+        z = np.asarray(z, dtype=float)
+        flat = z.ravel()
+        valid = np.isfinite(flat) & (flat > -1)
+        inside = valid & (flat <= self.zmax)
+        far = valid & ~inside
+        out = [np.full_like(flat, np.nan) for k in range(3)]
+        if inside.all():
+            out = self.tables(flat)
+        else:
+            for o, v in zip(out, self.tables(flat[inside])):
+                o[inside] = v
+            if far.any():
+                values, _ = adaptive(flat[far], self.H0, self.WM, self.WV, self.WR)
+                for o, v in zip(out, values):
+                    o[far] = v
+        return tuple(o.reshape(z.shape) for o in out)
+
+    def batch(self, z):
+        """cosmology.batch() for this parameter set."""
+        zage, DTT, DCMR = self.integrals(z)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            az = 1.0/(1+np.asarray(z, dtype=float))
+            return finish(az, zage, DTT, DCMR, self.H0, self.WK)
+
+    __call__ = batch
+
+    def _solve(self, f, target, xtol):
+        # z where the increasing function f(z) equals target: the table
+        # nodes bracket each root, then Illinois regula falsi in
+        # x = ln(1+z) shrinks the brackets below xtol
+        target = np.asarray(target, dtype=float)
+        t = target.ravel()
+        xs = self.tables.h*np.arange(self.nodes)
+        fs = f(np.expm1(xs))
+        j = np.clip(np.searchsorted(fs, t), 1, xs.size-1)
+        x = np.full(t.shape, np.nan)
+        k = np.flatnonzero((t >= fs[0]) & ((t <= fs[-1]) | np.isclose(t, fs[-1], rtol=1e-12, atol=0)))
+        lo, hi = xs[j[k]-1], xs[j[k]]
+        flo, fhi = fs[j[k]-1]-t[k], fs[j[k]]-t[k]
+        side = np.zeros(k.size, dtype=int)
+        for i in range(200):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                xn = np.where(fhi != flo, (lo*fhi-hi*flo)/(fhi-flo), 0.5*(lo+hi))
+            xn = np.clip(xn, lo, hi)
+            fn = f(np.expm1(xn))-t[k]
+            left = np.sign(fn) == np.sign(flo)
+            # Illinois step: halve the stale end if it stayed put twice
+            fhi = np.where(left & (side == 1), 0.5*fhi, fhi)
+            flo = np.where(~left & (side == -1), 0.5*flo, flo)
+            lo, flo = np.where(left, xn, lo), np.where(left, fn, flo)
+            hi, fhi = np.where(left, hi, xn), np.where(left, fhi, fn)
+            side = np.where(left, 1, -1)
+            done = (hi-lo <= xtol) | (fn == 0)
+            x[k[done]] = xn[done]
+            keep = ~done
+            k, lo, hi, flo, fhi, side = k[keep], lo[keep], hi[keep], flo[keep], fhi[keep], side[keep]
+            if not k.size:
+                break
+        x[k] = 0.5*(lo+hi)
+        return np.expm1(x).reshape(target.shape)
+
+    def z_at_DL(self, DL_Mpc, xtol=1e-10):
+        """Redshift of the luminosity distances DL_Mpc.
+
+        The result is within xtol in ln(1+z) of the root of the
+        interpolated DL, itself good to max_error.  Distances beyond
+        zmax give nan."""
+        return self._solve(lambda z: self.batch(z)['DL_Mpc'], DL_Mpc, xtol)
+
+    def z_at_distmod(self, distmod, xtol=1e-10):
+        """Redshift of the distance moduli m-M, see z_at_DL()."""
+        DL_Mpc = 10**((np.asarray(distmod, dtype=float)+5)/5.)/1e6
+        return self.z_at_DL(DL_Mpc, xtol)
+
+    def z_at_lookback(self, DTT_Gyr, xtol=1e-10):
+        """Redshift of the light travel times DTT_Gyr, see z_at_DL()."""
+        return self._solve(lambda z: self.batch(z)['DTT_Gyr'], DTT_Gyr, xtol)
+
+    def z_at_age(self, zage_Gyr, xtol=1e-10):
+        """Redshift at which the Universe had age zage_Gyr, see z_at_DL()."""
+        return self._solve(lambda z: -self.batch(z)['zage_Gyr'], -np.asarray(zage_Gyr, dtype=float), xtol)
+
+
+# inverse lookups for a single cosmology
+
+def z_at_DL(DL_Mpc, H0=H0_default, WM=WM_default, WV=None, WR=None, xtol=1e-10):
+    return Cosmology(H0, WM, WV, WR).z_at_DL(DL_Mpc, xtol)
+
+
+def z_at_distmod(distmod, H0=H0_default, WM=WM_default, WV=None, WR=None, xtol=1e-10):
+    return Cosmology(H0, WM, WV, WR).z_at_distmod(distmod, xtol)
+
+
+def z_at_lookback(DTT_Gyr, H0=H0_default, WM=WM_default, WV=None, WR=None, xtol=1e-10):
+    return Cosmology(H0, WM, WV, WR).z_at_lookback(DTT_Gyr, xtol)
+
+
+def z_at_age(zage_Gyr, H0=H0_default, WM=WM_default, WV=None, WR=None, xtol=1e-10):
+    return Cosmology(H0, WM, WV, WR).z_at_age(zage_Gyr, xtol)
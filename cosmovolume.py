@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+# Comoving volumes of redshift shells for survey forecasts.
+# The comoving distance to every bin edge comes from one cumulative()
+# sweep, the curvature correction is the same volume_ratio() that
+# cosmocalc.py applies to V_Gpc, and the shells are differences of the
+# enclosed volumes, so thousands of bins cost a single integration.
+
+import numpy as np
+
+from cosmology import H0_default, WM_default, c, n, densities, cumulative, \
+    transverse_ratio, volume_ratio, _rsqrt
+
+FULL_SKY = 4.*np.pi*(180./np.pi)**2  # square degrees in the whole sky
+
+
+def _enclosed(DCMR, WK):
+    # VCM of cosmocalc.py, in units of (c/H0)**3
+    x = np.sqrt(np.abs(WK))*DCMR
+    return volume_ratio(x, WK)*DCMR*DCMR*DCMR/3.
+
+
+def volume(z, H0=H0_default, WM=WM_default, WV=None, WR=None, n=n):
+    """V_Gpc, the comoving volume of the whole sky within each z, for
+    many redshifts of one cosmology in a single sweep."""
+    _, _, DCMR = cumulative(z, H0, WM, WV, WR, n)
+    WK = float(densities(H0, WM, WV, WR)[3])
+    return 4.*np.pi*((0.001*c/H0)**3)*_enclosed(DCMR, WK)
+
+
+def differential(z, H0=H0_default, WM=WM_default, WV=None, WR=None, n=n):
+    """dV/dz/dOmega in Mpc**3 per steradian at each z.
+
+    This is (c/H0)*DM**2/E(z), with DM the transverse comoving distance
+    DCMT and E(z) = H(z)/H0 = adot/a."""
+    _, _, DCMR = cumulative(z, H0, WM, WV, WR, n)
+    WM, WV, WR, WK = [float(w) for w in densities(H0, WM, WV, WR)]
+    az = 1.0/(1+np.asarray(z, dtype=float))
+    DCMT = transverse_ratio(np.sqrt(abs(WK))*DCMR, WK)*DCMR
+    # a/adot = a**2/(a*adot)
+    return (c/H0)**3*DCMT*DCMT*az*az*_rsqrt(az, WM, WV, WR, WK)
+
+
+def shells(edges, area=FULL_SKY, H0=H0_default, WM=WM_default, WV=None, WR=None, n=n):
+    """Comoving volumes in Gpc**3 of the redshift shells between
+    consecutive edges, for each sky area in square degrees.
+
+    edges must be increasing.  Returns an array of shape
+    np.shape(area) + (len(edges)-1,)."""
+    edges = np.asarray(edges, dtype=float).ravel()
+    if edges.size < 2 or np.any(np.diff(edges) < 0):
+        raise ValueError('edges must be an increasing sequence of at least two redshifts')
+    V = np.diff(volume(edges, H0, WM, WV, WR, n))
+    frac = np.asarray(area, dtype=float)/FULL_SKY
+    return frac[..., None]*V
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+# Vectorized version of the cCalc003CraterPython.py impact calculator
+# (H. J. Melosh's crater scaling program, see Melosh, Impact Cratering,
+# chapter 7).  Every input may be a NumPy array and they all broadcast
+# against each other, so millions of impact scenarios are evaluated in
+# a few array operations with no per-element Python branches.
+#
+# The script sets pi = 3.15145, a typo; the true value is used here.
+
+import numpy as np
+
+third = 1./3.
+
+# constants for the Schmidt-Holsapple pi scaling, indexed by targtype
+
+TARGETS = ('water', 'sand', 'rock')   # targtype 0, 1, 2
+Cd = np.array([1.88, 1.54, 1.6])
+beta = np.array([0.22, 0.165, 0.22])
+Ct = np.array([0.80, 1.3, 0.80])      # formation time coefficient
+
+gEarth = 9.8      # gravity acceleration earth
+gmoon = 1.67      # gravity acceleration moon
+rhomoon = 2700    # density moon
+Dstarmoon = 1.8e4  # simple to complex transition diameter on the moon
+Dprmoon = 1.4e5   # peak-ring crater diameter on the moon
+
+MEGATON = 2.387665e-16  # megatons of TNT per joule
+
+# crater type codes, and the names the script prints for them
+
+SIMPLE, COMPLEX, TRANSITIONAL, PEAK_RING = 0, 1, 2, 3
+CRATERTYPES = ('Simple', 'Complex', 'Simple/Complex', 'Peak-ring')
+
+# output columns, named after the script variables
+
+COLUMNS = ('impactorVolume', 'impactorMass', 'projectileKE', 'megatons', 'nL',
+           'Dpiscale', 'Dyield', 'Dgault', 'Tform', 'Dfinal', 'cratertype',
+           'continEjectaBlanket', 'ejectaSpread')
+
+# the Meteor Crater example of the script, with the inputs it means:
+# the script has v = 20000 km/s, theta = 0.787 (45 degrees in radians,
+# converted again as if in degrees) and g = 9.18 rather than gEarth
+METEOR = dict(L=40.0, v=20., theta=45., projectileDensity=8000., targetDensity=2500.,
+              g=9.8, targtype=2)
+
+
+def _targtype(targtype):
+    t = np.asarray(targtype)
+    if not np.issubdtype(t.dtype, np.integer):
+        if np.any(t != np.round(t)):
+            raise ValueError('targtype must be 0 (water), 1 (sand) or 2 (rock)')
+        t = t.astype(int)
+    if np.any((t < 0) | (t > 2)):
+        raise ValueError('targtype must be 0 (water), 1 (sand) or 2 (rock)')
+    return t
+
+
+def crater_type(Dsimple, Dfinal, Dstar, Dpr):
+    """The cratertype code of each crater, as the script decides it."""
+    code = np.where(Dsimple < Dstar, SIMPLE, COMPLEX).astype(np.uint8)
+    code[(Dsimple < Dstar*1.4) & (Dsimple > Dstar*0.71)] = TRANSITIONAL
+    code[Dfinal > Dpr] = PEAK_RING
+    return code
+
+
+def final(Dpiscale, Dstar):
+    """Final crater diameter from the pi-scaled transient diameter."""
+    Dsimple = 1.56*Dpiscale
+    return np.where(Dsimple < Dstar, Dsimple, Dsimple**1.18/Dstar**0.18)
+
+
+def target_factors(targetDensity=2500., g=gEarth, targtype=2):
+    """The target-dependent factors of the scaling laws, as a dict of
+    arrays broadcast against each other: g, targetDensity, Cd, beta,
+    Ct, Dstar, Dpr, rhot_sqrt (sqrt(targetDensity)), yieldfac
+    ((gEarth/g)**0.165), gaultfac ((gmoon/g)**0.165) and rock, whether
+    the rock Gault law applies.  They only depend on the target, so
+    they can be computed once and reused, see cratertargets.py."""
+    rhot, g = np.broadcast_arrays(np.asarray(targetDensity, dtype=float), np.asarray(g, dtype=float))
+    targtype = _targtype(targtype)
+    return {
+        'g': g, 'targetDensity': rhot,
+        'Cd': Cd[targtype], 'beta': beta[targtype], 'Ct': Ct[targtype],
+        'Dstar': (gmoon*rhomoon*Dstarmoon)/(g*rhot),
+        'Dpr': (gmoon*rhomoon*Dprmoon)/(g*rhot),
+        'rhot_sqrt': np.sqrt(rhot),
+        'yieldfac': (gEarth/g)**0.165,
+        'gaultfac': (gmoon/g)**0.165,
+        'rock': targtype == 2,
+    }
+
+
+def batch(L, v, theta=45., projectileDensity=3000., targetDensity=2500., g=gEarth, targtype=2):
+    """cCalc003CraterPython.py for arrays.
+
+    L is the projectile diameter in m, v the velocity in km/s, theta the
+    impact angle in degrees from the horizontal, the densities are in
+    kg/m^3 and g in m/s^2.  targtype is 0 for water, 1 for sand and 2
+    for rock.  All inputs broadcast against each other.  Returns a dict
+    of arrays keyed by COLUMNS; diameters are in m, Tform in s and
+    cratertype is a uint8 code indexing CRATERTYPES."""
+    return scale(L, v, theta, projectileDensity, target_factors(targetDensity, g, targtype))
+
+
+def scale(L, v, theta, projectileDensity, factors):
+    """batch() for the target described by factors, a dict as made by
+    target_factors(), whose arrays broadcast against the other inputs."""
+    f = factors
+    shape = np.broadcast_shapes(*[np.shape(x) for x in (L, v, theta, projectileDensity, f['Dstar'], f['Cd'])])
+    L, v, theta, rhop = [np.broadcast_to(np.asarray(x, dtype=float), shape)
+                         for x in (L, v, theta, projectileDensity)]
+    g, rhot = f['g'], f['targetDensity']
+
+    # convert units to SI and compute some auxiliary quantities
+    v = 1000*v
+    anglefac = np.sin(np.radians(theta))**third
+    densfac = rhop**0.16667/f['rhot_sqrt']
+    pifac = (1.61*g)/(v*v)
+    Dstar = f['Dstar']
+
+    out = {}
+    m = (np.pi/6)*rhop*L*L*L
+    KE = 0.5*m*v*v
+    out['impactorVolume'] = (np.pi/6)*L*L*L
+    out['impactorMass'] = m
+    out['projectileKE'] = KE
+    out['megatons'] = KE*MEGATON
+    with np.errstate(divide='ignore'):
+        out['nL'] = 1148*(L/1000)**-2.354
+
+    pitwo = pifac*L
+    dscale = (m/rhot)**third
+
+    # Pi Scaling (Schmidt and Holsapple 1987)
+    Dpiscale = dscale*f['Cd']*pitwo**-f['beta']*anglefac
+    out['Dpiscale'] = Dpiscale
+
+    # Yield Scaling (Nordyke 1962) with small correction for depth of
+    # projectile penetration
+    Dyield = 0.0133*KE**(1/3.4) + 1.51*np.sqrt(rhop/rhot)*L
+    out['Dyield'] = Dyield*anglefac*f['yieldfac']
+
+    # Gault (1974) Semi-Empirical scaling
+    gsmall = np.where(f['rock'], 0.015*densfac*KE**0.37*anglefac*anglefac,
+                      0.25*densfac*KE**0.29*anglefac)
+    Dgault = np.where(gsmall < 100, gsmall, 0.27*densfac*KE**0.28*anglefac)
+    out['Dgault'] = Dgault*f['gaultfac']
+
+    # crater formation time from Schmidt and Housen
+    out['Tform'] = (f['Ct']*L/v)*pitwo**-0.61
+
+    # final crater type and diameter from the pi-scaled transient diameter
+    Dfinal = final(Dpiscale, Dstar)
+    out['Dfinal'] = Dfinal
+    out['cratertype'] = crater_type(1.56*Dpiscale, Dfinal, Dstar, f['Dpr'])
+    out['continEjectaBlanket'] = Dfinal+Dfinal
+    out['ejectaSpread'] = Dfinal*2.15
+    return out
+
+
+def names(cratertype):
+    """The script's crater type names for an array of codes."""
+    return np.asarray(CRATERTYPES)[np.asarray(cratertype)]
+
+
+def transient(Dfinal, Dstar):
+    """Transient crater diameter from the final diameter, inverting final()."""
+    Dsimple = np.where(Dfinal < Dstar, Dfinal, (Dfinal*Dstar**0.18)**(1/1.18))
+    return Dsimple/1.56
+
+
+def _yield_root(D, a, b, p, tol=1e-14, maxiter=60):
+    # L with a*L**p + b*L = D for 0 < p < 1.  The left side is concave
+    # and increasing, so Newton steps from a lower bound climb to the
+    # root without overshooting.
+    D, a, b = [np.ravel(x) for x in np.broadcast_arrays(D, a, b)]
+    L = np.minimum(D/(2*b), (D/(2*a))**(1/p))
+    k = np.flatnonzero(np.isfinite(L) & (D > 0))
+    for i in range(maxiter):
+        if not k.size:
+            break
+        x = L[k]
+        f = a[k]*x**p+b[k]*x-D[k]
+        df = p*a[k]*x**(p-1)+b[k]
+        step = -f/df
+        L[k] = x+step
+        k = k[np.abs(step) > tol*np.abs(x)]
+    return L
+
+
+def projectile(D, v, theta=45., projectileDensity=3000., targetDensity=2500., g=gEarth,
+               targtype=2, final=False):
+    """Projectile diameters that make craters of diameter D m, the
+    inverse mode of the crater program.
+
+    The other inputs are as for batch() and broadcast against D.  With
+    final=True, D is a final crater diameter, which is first reduced to
+    the transient diameter as in Melosh's program.  Returns a dict of
+    arrays: Lpiscale from the closed-form inverse of pi-scaling, Lyield
+    from a vectorized Newton solve of yield scaling, Lgault from the
+    inverse of the Gault power laws (nan where no impactor gives that
+    crater, the smaller impactor where two do), Dtransient, and dStd,
+    the transient diameter divided by the impact angle factor."""
+    D, v, theta, rhop, rhot, g = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (D, v, theta, projectileDensity, targetDensity, g)])
+    targtype = np.broadcast_to(_targtype(targtype), D.shape)
+
+    v = 1000*v
+    anglefac = np.sin(np.radians(theta))**third
+    densfac = rhop**0.16667/np.sqrt(rhot)
+    pifac = (1.61*g)/(v*v)
+    if final:
+        Dstar = (gmoon*rhomoon*Dstarmoon)/(g*rhot)
+        D = transient(D, Dstar)
+    out = {'Dtransient': D, 'dStd': D/anglefac}
+    # KE = ke*L**3
+    ke = (np.pi/12)*rhop*v*v
+
+    # Pi Scaling: D = Cd*(pi*rhop/(6*rhot))**(1/3)*pifac**-beta*anglefac*L**(1-beta)
+    b = beta[targtype]
+    k = Cd[targtype]*((np.pi/6)*rhop/rhot)**third*pifac**-b*anglefac
+    out['Lpiscale'] = (D/k)**(1/(1-b))
+
+    # Yield Scaling: D = (0.0133*KE**(1/3.4) + 1.51*sqrt(rhop/rhot)*L)*anglefac*(gEarth/g)**0.165
+    Dy = D/(anglefac*(gEarth/g)**0.165)
+    out['Lyield'] = _yield_root(Dy, 0.0133*ke**(1/3.4), 1.51*np.sqrt(rhop/rhot), 3/3.4).reshape(D.shape)
+
+    # Gault scaling: gsmall is a power of KE, and above 100 the second
+    # power law takes over.  The jump between them can leave two
+    # impactors for one diameter below 100 m; the first law is used.
+    Dg = D/(gmoon/g)**0.165
+    rock = targtype == 2
+    c1 = np.where(rock, 0.015*densfac*anglefac*anglefac, 0.25*densfac*anglefac)
+    p1 = np.where(rock, 0.37, 0.29)
+    c2 = 0.27*densfac*anglefac
+    KE1 = (Dg/c1)**(1/p1)
+    KE2 = (Dg/c2)**(1/0.28)
+    KE = np.where(Dg < 100, KE1, np.where(c1*KE2**p1 >= 100, KE2, np.nan))
+    out['Lgault'] = np.cbrt(KE/ke)
+    return out
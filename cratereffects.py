@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+# Distance-dependent effects of impacts, as fields.
+# The crater script gives the seismic magnitude M at the impact site
+# and a single mEff at one effectRadius.  Here every effect is a
+# function of scenario and distance that broadcasts, so arrays of
+# scenarios are evaluated over arrays of radii or over lat/lon grids
+# around each impact point.  The relations are those of Collins,
+# Melosh and Marcus (2005), Earth Impact Effects Program.
+#
+#   import crater, cratereffects
+#   out = crater.batch(L, v)
+#   f = cratereffects.field(out['projectileKE'], out['Dpiscale'], radii_km)
+
+import numpy as np
+
+import crater
+
+R_EARTH = 6371.  # km
+
+KILOTON = 4.184e12  # joules per kiloton of TNT
+
+# surface burst air blast: peak overpressure px at scaled distance rx
+# for a 1 kt explosion
+px = 75000.  # Pa
+rx = 290.    # m
+
+vs = 5.      # km/s, seismic wave speed
+
+COLUMNS = ('mEff', 'seismic_arrival', 'ejecta_thickness', 'overpressure')
+
+CHUNK = 1 << 20  # scenario-grid values evaluated at a time
+
+
+def magnitude(projectileKE):
+    """Richter magnitude of the impact, M = 0.67*log10(KE) - 5.87,
+    the relation commented in the crater script."""
+    return 0.67*np.log10(projectileKE)-5.87
+
+
+def effective_magnitude(M, r):
+    """Seismic magnitude felt at r km from the impact.  Within 60 km
+    this is the script's M - 0.0238*r; further out the attenuation of
+    Collins et al. takes over."""
+    M, r = np.broadcast_arrays(np.asarray(M, dtype=float), np.asarray(r, dtype=float))
+    with np.errstate(divide='ignore'):
+        # epicentral distance in radians
+        far = M-1.66*np.log10(r/R_EARTH)-6.399
+    return np.where(r < 60, M-0.0238*r, np.where(r < 700, M-0.0048*r-1.1644, far))
+
+
+def ejecta_thickness(Dtransient, r):
+    """Ejecta thickness in m at r km from the impact, Dtransient**4/(112*r**3)
+    with the transient diameter in m; zero inside the transient crater."""
+    r = 1000*np.asarray(r, dtype=float)
+    Dtransient = np.asarray(Dtransient, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = Dtransient**4/(112*r**3)
+    return np.where(r >= 0.5*Dtransient, t, 0.)
+
+
+def overpressure(projectileKE, r):
+    """Peak air blast overpressure in Pa at r km from a surface impact."""
+    r1 = 1000*np.asarray(r, dtype=float)/np.cbrt(np.asarray(projectileKE, dtype=float)/KILOTON)
+    with np.errstate(divide='ignore'):
+        return px*rx/(4*r1)*(1+3*(rx/r1)**1.3)
+
+
+def effects(projectileKE, Dtransient, r):
+    """Every effect at r km, broadcasting the scenario arrays against r.
+    Returns a dict keyed by COLUMNS; seismic_arrival is in s.
+
+    This is magnitude() and the functions above with one logarithm of
+    r shared between them, as the hazard maps spend their time here."""
+    KE = np.asarray(projectileKE, dtype=float)
+    D = np.asarray(Dtransient, dtype=float)
+    r = np.asarray(r, dtype=float)
+    M = magnitude(KE)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lr = np.log(r)
+        far = M-(1.66/np.log(10.))*(lr-np.log(R_EARTH))-6.399
+        mEff = np.where(r < 60, M-0.0238*r, np.where(r < 700, M-0.0048*r-1.1644, far))
+        # in m
+        lm = lr+np.log(1000.)
+        t = np.where(r >= 0.0005*D, D**4/112*np.exp(-3*lm), 0.)
+        # scaled distance r1 = r/KE_kt**(1/3)
+        l1 = lm-np.log(KE/KILOTON)/3
+        p = px*rx/4*np.exp(-l1)*(1+3*np.exp(1.3*(np.log(rx)-l1)))
+    return {
+        'mEff': mEff,
+        'seismic_arrival': np.broadcast_to(r/vs, mEff.shape),
+        'ejecta_thickness': t,
+        'overpressure': p,
+    }
+
+
+def field(projectileKE, Dtransient, r):
+    """effects() of S scenarios over N radii, as (S, N) arrays."""
+    KE = np.asarray(projectileKE, dtype=float).reshape(-1, 1)
+    D = np.asarray(Dtransient, dtype=float).reshape(-1, 1)
+    return effects(KE, D, np.asarray(r, dtype=float).reshape(1, -1))
+
+
+def distance(lat0, lon0, lat, lon, radius=R_EARTH):
+    """Great circle distance in km between (lat0, lon0) and (lat, lon),
+    in degrees, by the haversine formula; broadcasts."""
+    lat0, lon0, lat, lon = [np.radians(np.asarray(x, dtype=float)) for x in (lat0, lon0, lat, lon)]
+    h = np.sin(0.5*(lat-lat0))**2+np.cos(lat0)*np.cos(lat)*np.sin(0.5*(lon-lon0))**2
+    return 2*radius*np.arcsin(np.sqrt(np.minimum(h, 1.)))
+
+
+def _unit(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.cos(lat)*np.cos(lon), np.cos(lat)*np.sin(lon), np.sin(lat)
+
+
+def hazard(projectileKE, Dtransient, lat0, lon0, lat, lon, radius=R_EARTH,
+           mEff_min=None, overpressure_min=None):
+    """Worst case of S scenarios at every point of a lat/lon grid.
+
+    lat and lon (degrees) broadcast to the grid shape; each scenario
+    has its impact point (lat0, lon0).  Returns a dict of grid arrays:
+    the largest mEff, ejecta_thickness and overpressure over all
+    scenarios and, for any threshold given, the number of scenarios
+    reaching it ('mEff_count', 'overpressure_count').  Scenarios are
+    done in blocks so that memory stays near CHUNK values."""
+    KE, D, lat0, lon0 = [np.ravel(x) for x in np.broadcast_arrays(
+        np.asarray(projectileKE, dtype=float), np.asarray(Dtransient, dtype=float),
+        np.asarray(lat0, dtype=float), np.asarray(lon0, dtype=float))]
+    lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float))
+    shape = lat.shape
+    lat, lon = lat.ravel(), lon.ravel()
+    # unit vectors of the grid points and impact points; distances come
+    # from the chords between them, so the grid trigonometry is done once
+    grid = _unit(lat, lon)
+    points = _unit(lat0, lon0)
+    out = {k: np.full(lat.size, -np.inf) for k in ('mEff', 'ejecta_thickness', 'overpressure')}
+    if mEff_min is not None:
+        out['mEff_count'] = np.zeros(lat.size, dtype=np.int64)
+    if overpressure_min is not None:
+        out['overpressure_count'] = np.zeros(lat.size, dtype=np.int64)
+    step = max(1, CHUNK//max(lat.size, 1))
+    for lo in range(0, KE.size, step):
+        s = slice(lo, lo+step)
+        c2 = sum((g-p[s, None])**2 for g, p in zip(grid, points))
+        r = 2*radius*np.arcsin(np.minimum(0.5*np.sqrt(c2), 1.))
+        f = effects(KE[s, None], D[s, None], r)
+        for k in ('mEff', 'ejecta_thickness', 'overpressure'):
+            np.maximum(out[k], f[k].max(axis=0), out=out[k])
+        if mEff_min is not None:
+            out['mEff_count'] += np.count_nonzero(f['mEff'] >= mEff_min, axis=0)
+        if overpressure_min is not None:
+            out['overpressure_count'] += np.count_nonzero(f['overpressure'] >= overpressure_min, axis=0)
+    return {k: v.reshape(shape) for k, v in out.items()}
+
+
+def scenarios(L, v, theta=45., projectileDensity=3000., targetDensity=2500., g=crater.gEarth,
+              targtype=2):
+    """(projectileKE, Dtransient) of impact scenarios, from crater.batch()."""
+    out = crater.batch(L, v, theta, projectileDensity, targetDensity, g, targtype)
+    return out['projectileKE'], out['Dpiscale']
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+# Ejecta thickness maps for many craters.
+# Each crater lays down ejecta from its rim out to the edge of its
+# continuous ejecta blanket, thinning as (r/R)**-3 from a rim thickness
+# of 0.14*R**0.74 m (McGetchin et al. 1973, R the crater radius in m).
+# The map is a regular grid, typically a memory-mapped .npy file, and
+# is filled one tile at a time; in each tile every crater touches only
+# the cells inside its own footprint.
+#
+#   python craterejecta.py map.npy craters.npz --shape 10000 10000 --res 10
+
+import argparse
+import sys
+
+import numpy as np
+
+TILE = 2048      # cells along each side of a tile
+CELLS = 1 << 22  # crater-cell pairs evaluated at a time
+
+
+def thickness(r, R, edge):
+    """Ejecta thickness in m at distance r from the centre of a crater
+    of radius R whose blanket ends at radius edge; zero inside the rim
+    and beyond the edge."""
+    r = np.asarray(r, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = 0.14*R**0.74*(r/R)**-3
+    return np.where((r >= R) & (r <= edge), t, 0.)
+
+
+def _tile(block, x, y, R, edge, x0, y0, res):
+    # add the ejecta of the craters to block, whose first cell centre
+    # is at (x0, y0)
+    ny, nx = block.shape
+    ix0 = np.clip(np.floor((x-edge-x0)/res).astype(np.int64), 0, nx)
+    ix1 = np.clip(np.ceil((x+edge-x0)/res).astype(np.int64)+1, 0, nx)
+    iy0 = np.clip(np.floor((y-edge-y0)/res).astype(np.int64), 0, ny)
+    iy1 = np.clip(np.ceil((y+edge-y0)/res).astype(np.int64)+1, 0, ny)
+    w = ix1-ix0
+    h = iy1-iy0
+    k = np.flatnonzero((w > 0) & (h > 0))
+    if not k.size:
+        return
+    w, h = w[k], h[k]
+    area = w*h
+    # t = A/r**3 between R**2 <= r**2 <= edge**2
+    A = 0.14*R[k]**3.74
+    R2 = R[k]*R[k]
+    E2 = edge[k]*edge[k]
+    flat = block.reshape(-1)
+    cum = np.cumsum(area)
+    cuts = np.searchsorted(cum, np.arange(CELLS, cum[-1], CELLS))
+    cuts = np.unique(np.concatenate(([0], cuts, [k.size])))
+    for lo, hi in zip(cuts[:-1], cuts[1:]):
+        q = np.arange(lo, hi)
+        c = np.repeat(q, area[q])
+        local = np.arange(c.size)-np.repeat(np.cumsum(area[q])-area[q], area[q])
+        j, i = np.divmod(local, w[c])
+        i += ix0[k[c]]
+        j += iy0[k[c]]
+        dx = x0+i*res-x[k[c]]
+        dy = y0+j*res-y[k[c]]
+        r2 = dx*dx+dy*dy
+        m = (r2 >= R2[c]) & (r2 <= E2[c])
+        t = A[c[m]]*r2[m]**-1.5
+        flat += np.bincount(j[m]*nx+i[m], weights=t, minlength=flat.size)
+
+
+def accumulate(out, x, y, Dfinal, blanket=None, x0=0., y0=0., res=1., tile=TILE):
+    """Add the ejecta of craters at (x, y) with final diameters Dfinal
+    to the 2-d array out, in place.
+
+    Cell (j, i) of out is centred on (x0+(i+0.5)*res, y0+(j+0.5)*res).
+    blanket is the continEjectaBlanket diameter, 2*Dfinal by default,
+    so that the blanket reaches one crater radius beyond the rim.  out
+    may be a memory map; it is read and written one tile at a time."""
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    D = np.asarray(Dfinal, dtype=float).ravel()
+    R = 0.5*D
+    edge = 0.5*(2*D if blanket is None else np.asarray(blanket, dtype=float).ravel())
+    ny, nx = out.shape
+    for j0 in range(0, ny, tile):
+        for i0 in range(0, nx, tile):
+            block = out[j0:j0+tile, i0:i0+tile]
+            # the craters whose footprint meets this tile
+            tx0 = x0+i0*res
+            ty0 = y0+j0*res
+            k = ((x+edge > tx0) & (x-edge < tx0+block.shape[1]*res) &
+                 (y+edge > ty0) & (y-edge < ty0+block.shape[0]*res))
+            if not k.any():
+                continue
+            acc = np.zeros(block.shape)
+            _tile(acc, x[k], y[k], R[k], edge[k], tx0+0.5*res, ty0+0.5*res, res)
+            block += acc.astype(block.dtype)
+    if hasattr(out, 'flush'):
+        out.flush()
+    return out
+
+
+def raster(path, shape, x, y, Dfinal, blanket=None, x0=0., y0=0., res=1., tile=TILE,
+           dtype=np.float32):
+    """Write the ejecta thickness map of the craters to a new .npy file
+    of the given (ny, nx) shape, memory mapped, and return the map."""
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    return accumulate(out, x, y, Dfinal, blanket, x0, y0, res, tile)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ejecta thickness map of many craters')
+    parser.add_argument('output', help='output .npy map')
+    parser.add_argument('craters', help='.npz with x, y and Dfinal arrays (m), e.g. from cratersurface.py')
+    parser.add_argument('--shape', type=int, nargs=2, required=True, help='rows and columns')
+    parser.add_argument('--res', type=float, default=1., help='cell size in m')
+    parser.add_argument('--origin', type=float, nargs=2, default=(0., 0.), help='x and y of the map corner')
+    args = parser.parse_args(argv)
+    with np.load(args.craters) as c:
+        blanket = c['continEjectaBlanket'] if 'continEjectaBlanket' in c else None
+        out = raster(args.output, args.shape, c['x'], c['y'], c['Dfinal'], blanket,
+                     args.origin[0], args.origin[1], args.res)
+    print('%s: %d x %d cells, thickest %.4g m' % (args.output, out.shape[0], out.shape[1], out.max()),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
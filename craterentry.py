@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+# Atmospheric entry of impactors before crater scaling.
+# The crater script scales craters from the energy "prior to entry into
+# Atmosphere"; here the impactors first fly through an exponential
+# atmosphere with drag, ablation and, once the ram pressure exceeds
+# their strength, pancake spreading of the fragmented body (Collins,
+# Melosh and Marcus 2005, and Chyba et al. 1993).  An impactor that
+# spreads to PANCAKE times its radius bursts in the air; the others hit
+# the ground with the velocity, mass and angle they have left, and
+# those go through crater.batch().
+#
+# The equations of motion of all impactors are integrated together
+# with Dormand-Prince 5(4) steps.  Every impactor has its own step
+# size, and impactors leave the active set as soon as they burst,
+# ablate away or reach the ground.
+#
+#   python craterentry.py --L 10 30 100 --v 20 --projectileDensity 3000
+
+import argparse
+
+import numpy as np
+
+import crater
+
+rho0 = 1.0       # atmospheric density at the surface, kg/m^3
+Hscale = 8000.   # scale height, m
+z0 = 1e5         # starting altitude, m
+Rplanet = 6.371e6  # m, for the curvature of the trajectory
+
+CD = 2.          # drag coefficient
+CH = 0.1         # heat transfer coefficient
+Qablation = 8e6  # heat of ablation, J/kg
+PANCAKE = 7.     # radius growth at which the pancake bursts
+MIN_MASS = 1e-6  # fraction of the mass below which an impactor is ablated
+
+# fates; grazing impactors can skip out of the atmosphere again
+GROUND, AIRBURST, ABLATED, ESCAPED = 0, 1, 2, 3
+FATES = ('ground', 'airburst', 'ablated', 'escaped')
+
+# the cratertype of impactors that never reach the ground, outside the
+# crater.CRATERTYPES codes
+NO_CRATER = 255
+
+# state: v (m/s), mass fraction, theta (rad), z (m), radius fraction
+# and its rate of growth (1/s)
+ATOL = np.array([1e-2, 1e-9, 1e-9, 1e-2, 1e-9, 1e-9])
+RTOL = 1e-6
+HMAX = 0.5       # s
+MAXSTEPS = 100000
+
+# Dormand-Prince 5(4)
+_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0., 500/1113, 125/192, -2187/6784, 11/84),
+)
+_E = np.array([71/57600, 0., -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+
+
+def strength(projectileDensity):
+    """Yield strength in Pa of an impactor of the given density, the
+    fit of Collins et al. (2005)."""
+    return 10**(2.107+0.0624*np.sqrt(np.asarray(projectileDensity, dtype=float)))
+
+
+def _rates(y, p, broken, g):
+    v, mu, theta, z, s, ds = y.T
+    # trial states of too long steps may go far below ground
+    rhoa = rho0*np.exp(np.minimum(-z/Hscale, 50.))
+    area = p['area0']*s*s
+    dv = -CD*rhoa*area*v*v/(2*p['m0']*mu)+g*np.sin(theta)
+    dmu = -CH*rhoa*area*v*v*v/(2*Qablation*p['m0'])
+    dtheta = (g/v-v/(Rplanet+z))*np.cos(theta)
+    dz = -v*np.sin(theta)
+    # the pancake spreads as d2L/dt2 = CD*rhoa*v**2/(rhoi*L)
+    dds = np.where(broken, CD*rhoa*v*v/(4*p['rhoi']*p['r0']*p['r0']*s), 0.)
+    return np.stack((dv, dmu, dtheta, dz, ds, dds), axis=1)
+
+
+def entry(L, v, theta=45., projectileDensity=3000., g=crater.gEarth, Y=None, h=0.01):
+    """Fly impactors of diameter L m, entry velocity v km/s and angle
+    theta degrees from the horizontal through the atmosphere.
+
+    Y is the strength in Pa, strength(projectileDensity) by default;
+    all inputs broadcast.  Returns a dict of arrays: at the surface
+    'v' (km/s), 'mass' (kg), 'L', the diameter of a sphere of that
+    mass, and 'theta'; 'fate', a code indexing FATES; 'zBreakup' and
+    'zBurst', the altitudes of breakup and airburst (nan if none); and
+    'airburstKE', the kinetic energy in J lost in the atmosphere."""
+    L, v, theta, rhoi, g = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (L, v, theta, projectileDensity, g)])
+    shape = L.shape
+    L, v, theta, rhoi, g = [x.ravel() for x in (L, v, theta, rhoi, g)]
+    Y = strength(rhoi) if Y is None else np.broadcast_to(np.asarray(Y, dtype=float), shape).ravel()
+    n = L.size
+    r0 = 0.5*L
+    m0 = (np.pi/6)*rhoi*L*L*L
+
+    out = {
+        'v': np.zeros(n), 'mass': np.zeros(n), 'theta': np.zeros(n),
+        'fate': np.zeros(n, dtype=np.uint8),
+        'zBreakup': np.full(n, np.nan), 'zBurst': np.full(n, np.nan),
+    }
+    # the active set, compressed as impactors finish
+    idx = np.arange(n)
+    y = np.stack((1000*v, np.ones(n), np.radians(theta), np.full(n, z0), np.ones(n), np.zeros(n)),
+                 axis=1)
+    p = {'r0': r0, 'm0': m0, 'area0': np.pi*r0*r0, 'rhoi': rhoi}
+    Y = Y.copy()
+    broken = np.zeros(n, dtype=bool)
+    h = np.full(n, float(h))
+    for step in range(MAXSTEPS):
+        if not idx.size:
+            break
+        k = [_rates(y, p, broken, g)]
+        for a in _A[1:]:
+            yi = y+h[:, None]*sum(c*ki for c, ki in zip(a, k) if c)
+            k.append(_rates(yi, p, broken, g))
+        # yi is the 5th order solution, as the last row of _A is its weights
+        ynew = yi
+        err = h[:, None]*sum(e*ki for e, ki in zip(_E, k) if e)
+        scale = ATOL+RTOL*np.maximum(np.abs(y), np.abs(ynew))
+        with np.errstate(invalid='ignore'):
+            e = np.sqrt(np.mean((err/scale)**2, axis=1))
+        e = np.where(np.isfinite(e), e, 1e10)
+        ok = e <= 1.
+        old = y
+        y = np.where(ok[:, None], ynew, y)
+        with np.errstate(divide='ignore'):
+            h = np.minimum(h*np.clip(0.9*e**-0.2, 0.2, 5.), HMAX)
+
+        # breakup once the ram pressure exceeds the strength
+        rhoa = rho0*np.exp(-y[:, 3]/Hscale)
+        new = ok & ~broken & (rhoa*y[:, 0]**2 > Y)
+        broken |= new
+        out['zBreakup'][idx[new]] = y[new, 3]
+
+        # events, found by linear interpolation within the step
+        ground = ok & (y[:, 3] <= 0)
+        burst = ok & ~ground & (y[:, 4] >= PANCAKE)
+        ablated = ok & ~ground & ~burst & (y[:, 1] < MIN_MASS)
+        escaped = ok & (y[:, 3] > z0) & (y[:, 2] < 0)
+        f = np.ones(idx.size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f[ground] = old[ground, 3]/(old[ground, 3]-y[ground, 3])
+            f[burst] = (PANCAKE-old[burst, 4])/(y[burst, 4]-old[burst, 4])
+        done = ground | burst | ablated | escaped
+        if done.any():
+            ye = old[done]+np.clip(f[done], 0., 1.)[:, None]*(y[done]-old[done])
+            i = idx[done]
+            out['fate'][i] = np.select([ground[done], burst[done], ablated[done]],
+                                       [GROUND, AIRBURST, ABLATED], ESCAPED)
+            out['zBurst'][i] = np.where(burst[done], ye[:, 3], np.nan)
+            landed = ground[done]
+            out['v'][i[landed]] = ye[landed, 0]/1000
+            out['mass'][i[landed]] = ye[landed, 1]*m0[i[landed]]
+            out['theta'][i[landed]] = np.degrees(ye[landed, 2])
+            keep = ~done
+            idx, y, h, broken, g, Y = idx[keep], y[keep], h[keep], broken[keep], g[keep], Y[keep]
+            p = {key: value[keep] for key, value in p.items()}
+    else:
+        raise RuntimeError('%d impactors did not finish in %d steps' % (idx.size, MAXSTEPS))
+    out['L'] = np.cbrt(out['mass']/((np.pi/6)*rhoi))
+    out['airburstKE'] = 0.5*m0*(1000*v)**2-0.5*out['mass']*(1000*out['v'])**2
+    return {key: value.reshape(shape) for key, value in out.items()}
+
+
+def impact(L, v, theta=45., projectileDensity=3000., targetDensity=2500., g=crater.gEarth,
+           targtype=2, Y=None):
+    """crater.batch() of what is left of the impactors at the surface.
+
+    The arguments are those of crater.batch(), with v the entry
+    velocity.  Returns the crater.batch() columns, computed from the
+    surface velocity, angle and mass, with zero crater sizes and
+    energies and cratertype NO_CRATER for impactors that never reach
+    the ground; and the entry() results, with 'entry' prepended to
+    their names (entryv, entryL, entryfate, ...)."""
+    L, v, theta, rhop, rhot, g = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (L, v, theta, projectileDensity, targetDensity, g)])
+    e = entry(L, v, theta, rhop, g, Y)
+    ground = e['fate'] == GROUND
+    # dummy values for the others, zeroed below
+    Ls = np.where(ground, e['L'], 1.)
+    vs = np.where(ground, e['v'], 1.)
+    ts = np.where(ground, e['theta'], 45.)
+    out = crater.batch(Ls, vs, ts, rhop, rhot, g, targtype)
+    for key in crater.COLUMNS:
+        if key not in ('nL', 'cratertype'):
+            out[key] = np.where(ground, out[key], 0.)
+    out['cratertype'] = np.where(ground, out['cratertype'], NO_CRATER).astype(np.uint8)
+    out['nL'] = crater.batch(L, v, theta, rhop, rhot, g, targtype)['nL']
+    out.update(('entry'+key, value) for key, value in e.items())
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Atmospheric entry of impactors and their craters')
+    parser.add_argument('--L', type=float, nargs='+', default=[10., 30., 100., 300.], help='diameters in m')
+    parser.add_argument('--v', type=float, default=20., help='entry velocity in km/s')
+    parser.add_argument('--theta', type=float, default=45., help='entry angle in degrees')
+    parser.add_argument('--projectileDensity', type=float, default=3000., help='kg/m^3')
+    args = parser.parse_args(argv)
+    out = impact(np.array(args.L), args.v, args.theta, args.projectileDensity)
+    print('%10s %9s %10s %10s %10s %10s' % ('L', 'fate', 'zBurst', 'v', 'Lsurface', 'Dfinal'))
+    for i, L in enumerate(args.L):
+        print('%10.4g %9s %10.4g %10.4g %10.4g %10.4g' % (
+            L, FATES[out['entryfate'][i]], out['entryzBurst'][i], out['entryv'][i], out['entryL'][i],
+            out['Dfinal'][i]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+# Monte Carlo impact histories from the near-Earth asteroid population.
+# Impactor diameters are drawn from the NEA size-frequency law of the
+# crater script, nL = 1148*(L/1000)**-2.354, together with velocity,
+# impact angle and density distributions.  The impactors are pushed
+# through crater.batch() in chunks and only histograms of the outputs
+# are kept, so the number of events is limited by time, not memory.
+#
+#   python craterpop.py --years 1e6 --Lmin 10 --seed 1
+
+import argparse
+import sys
+
+import numpy as np
+
+import crater
+import craterentry
+
+ALPHA = 2.354     # slope of the cumulative NEA size-frequency law
+RATE = 1.5e-9     # impacts per NEA per year (a 1 km impact every ~600,000 years)
+CHUNK = 1 << 20   # impactors per chunk
+
+
+def n_larger(L):
+    """Number of near-Earth asteroids with diameter larger than L m."""
+    return 1148*(np.asarray(L, dtype=float)/1000)**-ALPHA
+
+
+def diameters(rng, size, Lmin=10., Lmax=1e4):
+    """Diameters in m drawn from the NEA power law between Lmin and Lmax."""
+    u = rng.random(size)
+    return Lmin*(1-u*(1-(Lmin/Lmax)**ALPHA))**(-1/ALPHA)
+
+
+def angles(rng, size):
+    """Impact angles in degrees with the sin(2 theta) distribution of
+    isotropic impactors, theta measured from the horizontal."""
+    return np.degrees(np.arcsin(np.sqrt(rng.random(size))))
+
+
+def velocities(rng, size, mean=20., sd=5., vmin=11.2):
+    """Impact velocities in km/s, normal with the given mean and sd,
+    redrawn below the escape velocity vmin."""
+    v = rng.normal(mean, sd, size)
+    low = v < vmin
+    while low.any():
+        v[low] = rng.normal(mean, sd, low.sum())
+        low = v < vmin
+    return v
+
+
+# projectile densities in kg/m^3 and their fractions: carbonaceous,
+# stony and iron
+DENSITIES = ((1500., 0.15), (3000., 0.75), (8000., 0.10))
+
+
+def densities(rng, size, mix=DENSITIES):
+    """Projectile densities drawn from a (density, fraction) mixture."""
+    values, weights = np.array(mix, dtype=float).T
+    return rng.choice(values, size, p=weights/weights.sum())
+
+
+class Histogram(object):
+    """Counts in logarithmic bins, accumulated over chunks, with
+    separate underflow and overflow counts."""
+
+    def __init__(self, lo, hi, bins=100):
+        self.edges = np.logspace(np.log10(lo), np.log10(hi), bins+1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.under = 0
+        self.over = 0
+
+    def add(self, x):
+        self.counts += np.histogram(x, self.edges)[0]
+        self.under += int(np.count_nonzero(x < self.edges[0]))
+        self.over += int(np.count_nonzero(x > self.edges[-1]))
+
+    def cumulative(self):
+        """Number of values above each lower bin edge."""
+        return self.counts[::-1].cumsum()[::-1] + self.over
+
+
+def _draw(x, rng, size):
+    # a distribution is a sampler f(rng, size) or a constant
+    if callable(x):
+        return x(rng, size)
+    return np.full(size, x, dtype=float)
+
+
+class Population(object):
+    """The histograms of one simulated impact history.
+
+    Dfinal in m, energy in megatons, and crater type counts indexed
+    by the crater.CRATERTYPES codes.  With atmospheric entry only the
+    impactors reaching the ground are histogrammed; fates counts all
+    of them by craterentry.FATES code."""
+
+    def __init__(self, Dmin=1., Dmax=1e6, Emin=1e-6, Emax=1e8, bins=100):
+        self.Dfinal = Histogram(Dmin, Dmax, bins)
+        self.megatons = Histogram(Emin, Emax, bins)
+        self.cratertype = np.zeros(len(crater.CRATERTYPES), dtype=np.int64)
+        self.impacts = 0
+        self.total_megatons = 0.
+        self.largest = None
+        self.fates = np.zeros(len(craterentry.FATES), dtype=np.int64)
+
+    def add(self, out, L):
+        self.impacts += L.size
+        if 'entryfate' in out:
+            self.fates += np.bincount(out['entryfate'], minlength=len(craterentry.FATES))
+            ground = out['entryfate'] == craterentry.GROUND
+            out = {k: v[ground] for k, v in out.items()}
+            L = L[ground]
+        self.Dfinal.add(out['Dfinal'])
+        self.megatons.add(out['megatons'])
+        self.cratertype += np.bincount(out['cratertype'], minlength=len(crater.CRATERTYPES))
+        self.total_megatons += float(out['megatons'].sum())
+        if L.size:
+            i = int(np.argmax(out['Dfinal']))
+            if self.largest is None or out['Dfinal'][i] > self.largest['Dfinal']:
+                self.largest = {k: float(out[k][i]) for k in crater.COLUMNS}
+                self.largest['L'] = float(L[i])
+
+
+def simulate(impacts=None, years=None, Lmin=10., Lmax=1e4, v=velocities, theta=angles,
+             projectileDensity=densities, targetDensity=2500., g=crater.gEarth, targtype=2,
+             seed=0, chunk=CHUNK, rate=RATE, population=None, atmosphere=False):
+    """Simulate an impact history and return its Population.
+
+    Give either the number of impacts, or years, in which case the
+    number is Poisson with mean rate*(n_larger(Lmin)-n_larger(Lmax))*years,
+    the impactors between Lmin and Lmax.  v, theta, the densities, g
+    and targtype are each a constant or a sampler f(rng, size).  Every
+    chunk has its own random stream keyed by the seed and the chunk
+    index, so the same seed and chunk always give the same history.
+    With atmosphere=True the impactors first go through
+    craterentry.impact(), and craters are scaled from what reaches the
+    ground."""
+    rng = np.random.default_rng([seed])
+    if impacts is None:
+        if years is None:
+            raise ValueError('give impacts or years')
+        impacts = int(rng.poisson(rate*float(n_larger(Lmin)-n_larger(Lmax))*years))
+    pop = population or Population()
+    for i, lo in enumerate(range(0, impacts, chunk)):
+        size = min(chunk, impacts-lo)
+        rng = np.random.default_rng([seed, i+1])
+        L = diameters(rng, size, Lmin, Lmax)
+        args = [_draw(x, rng, size) for x in (v, theta, projectileDensity, targetDensity, g)]
+        tt = _draw(targtype, rng, size).astype(int)
+        model = craterentry.impact if atmosphere else crater.batch
+        pop.add(model(L, *args, targtype=tt), L)
+    return pop
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monte Carlo impact history from the NEA population')
+    parser.add_argument('--years', type=float, default=None, help='length of the history')
+    parser.add_argument('--impacts', type=int, default=None, help='number of impacts instead of years')
+    parser.add_argument('--Lmin', type=float, default=10., help='smallest impactor in m')
+    parser.add_argument('--Lmax', type=float, default=1e4, help='largest impactor in m')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--atmosphere', action='store_true', help='fly the impactors through the atmosphere')
+    parser.add_argument('--output', default=None, help='.npz file for the histograms')
+    args = parser.parse_args(argv)
+    if args.years is None and args.impacts is None:
+        args.years = 1e6
+    pop = simulate(args.impacts, args.years, args.Lmin, args.Lmax, seed=args.seed, atmosphere=args.atmosphere)
+    print('%d impacts, %.4g megatons in total' % (pop.impacts, pop.total_megatons))
+    if args.atmosphere:
+        for name, n in zip(craterentry.FATES, pop.fates):
+            print('%-15s %d' % (name, n))
+    for name, n in zip(crater.CRATERTYPES, pop.cratertype):
+        print('%-15s %d' % (name, n))
+    if pop.largest:
+        print('largest crater %.4g m from a %.4g m impactor' % (pop.largest['Dfinal'], pop.largest['L']))
+    if args.output:
+        np.savez(args.output, Dfinal_edges=pop.Dfinal.edges, Dfinal_counts=pop.Dfinal.counts,
+                 megatons_edges=pop.megatons.edges, megatons_counts=pop.megatons.counts,
+                 cratertype=pop.cratertype)
+        print('histograms written to %s' % args.output, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
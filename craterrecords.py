@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+# Compact crater results and columnar binary output.
+# A crater run is kept as a structured array with one record per
+# impact, and written to a directory holding one .npy file per column.
+# Chunks are appended to the column files in place, and the .npy
+# headers are updated after every chunk, so a directory can be
+# memory mapped or appended to at any time and a reader never parses
+# text.
+#
+#   python craterrecords.py run/ --impacts 10000000 --Lmin 10
+
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+import crater
+import cratereffects
+import craterpop
+
+# the script's outputs; cratertype is the crater.CRATERTYPES code
+DTYPE = np.dtype([
+    ('impactorVolume', 'f8'), ('impactorMass', 'f8'), ('projectileKE', 'f8'),
+    ('Dpiscale', 'f8'), ('Dyield', 'f8'), ('Dgault', 'f8'), ('Dfinal', 'f8'),
+    ('cratertype', 'u1'), ('Tform', 'f8'), ('M', 'f8'), ('mEff', 'f8'), ('nL', 'f8'),
+    ('ejectaSpread', 'f8'),
+])
+
+effectRadius = 10.  # km, as in the script
+
+HEADER = 128  # bytes of the .npy headers written here
+
+
+def records(out, effectRadius=effectRadius):
+    """The crater.batch() results out as a structured array of DTYPE,
+    with the seismic magnitude M and mEff at effectRadius km."""
+    rec = np.empty(np.shape(out['Dfinal']), dtype=DTYPE)
+    for k in DTYPE.names:
+        if k in out:
+            rec[k] = out[k]
+    rec['M'] = cratereffects.magnitude(out['projectileKE'])
+    rec['mEff'] = cratereffects.effective_magnitude(rec['M'], effectRadius)
+    return rec
+
+
+def _header(dtype, n, size):
+    # a version 1.0 .npy header for n items, padded to size bytes
+    d = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+        np.lib.format.dtype_to_descr(dtype), n)
+    head = d.ljust(size-10-1)+'\n'
+    if len(head)+10 > size:
+        raise ValueError('no room for the .npy header')
+    return b'\x93NUMPY\x01\x00'+struct.pack('<H', len(head))+head.encode('latin1')
+
+
+class Columns(object):
+    """A directory of appendable .npy column files, one per field of
+    dtype.  Existing columns are appended to; they must all have the
+    same length, and nothing is created unless they do."""
+
+    def __init__(self, path, dtype=DTYPE):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        os.makedirs(path, exist_ok=True)
+        self.files = {}
+        self.offsets = {}
+        try:
+            # the existing columns first, so nothing is created unless
+            # they agree
+            lengths = set()
+            for k in self.dtype.names:
+                name = os.path.join(path, k+'.npy')
+                if os.path.exists(name):
+                    f = self.files[k] = open(name, 'r+b')
+                    version = np.lib.format.read_magic(f)
+                    read = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                            else np.lib.format.read_array_header_2_0)
+                    shape, fortran, dt = read(f)
+                    if dt != self.dtype[k] or len(shape) != 1:
+                        raise ValueError('%s holds %s%s, not %s' % (name, dt, shape, self.dtype[k]))
+                    lengths.add(shape[0])
+                    self.offsets[k] = f.tell()
+            if len(self.files) < len(self.dtype.names):
+                lengths.add(0)
+            if len(lengths) > 1:
+                raise ValueError('columns of %s differ in length' % path)
+            for k in self.dtype.names:
+                if k not in self.files:
+                    f = self.files[k] = open(os.path.join(path, k+'.npy'), 'w+b')
+                    f.write(_header(self.dtype[k], 0, HEADER))
+                    self.offsets[k] = HEADER
+        except Exception:
+            self.close()
+            raise
+        self.size = lengths.pop()
+
+    def __len__(self):
+        return self.size
+
+    def append(self, rec):
+        """Append a structured array, or a dict of arrays keyed by the
+        fields, to every column."""
+        n = len(rec[self.dtype.names[0]])
+        for k in self.dtype.names:
+            f = self.files[k]
+            f.seek(self.offsets[k]+self.size*self.dtype[k].itemsize)
+            f.write(np.ascontiguousarray(rec[k], dtype=self.dtype[k]).tobytes())
+        self.size += n
+        for k in self.dtype.names:
+            f = self.files[k]
+            f.seek(0)
+            f.write(_header(self.dtype[k], self.size, self.offsets[k]))
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load(path, columns=None, mmap_mode='r'):
+    """The columns of a directory written by Columns, as a dict of
+    (memory mapped) arrays; all the .npy files by default."""
+    if columns is None:
+        columns = sorted(f[:-4] for f in os.listdir(path) if f.endswith('.npy'))
+    return {k: np.load(os.path.join(path, k+'.npy'), mmap_mode=mmap_mode) for k in columns}
+
+
+def run(path, impacts, Lmin=10., Lmax=1e4, seed=0, chunk=craterpop.CHUNK):
+    """Append impacts records of impactors drawn as in
+    craterpop.simulate() to the columns in path; returns the column
+    length."""
+    with Columns(path) as cols:
+        for i, lo in enumerate(range(0, impacts, chunk)):
+            size = min(chunk, impacts-lo)
+            rng = np.random.default_rng([seed, i+1])
+            L = craterpop.diameters(rng, size, Lmin, Lmax)
+            v = craterpop.velocities(rng, size)
+            theta = craterpop.angles(rng, size)
+            rhop = craterpop.densities(rng, size)
+            cols.append(records(crater.batch(L, v, theta, rhop)))
+        return len(cols)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crater records of an impactor population as .npy columns')
+    parser.add_argument('path', help='directory of column files, appended to if it exists')
+    parser.add_argument('--impacts', type=int, default=1000000, help='number of impacts')
+    parser.add_argument('--Lmin', type=float, default=10., help='smallest impactor in m')
+    parser.add_argument('--Lmax', type=float, default=1e4, help='largest impactor in m')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args(argv)
+    n = run(args.path, args.impacts, args.Lmin, args.Lmax, args.seed)
+    print('%s: %d records' % (args.path, n), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
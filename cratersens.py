@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+
+# Global sensitivity analysis of the crater scaling.
+# Which inputs drive the spread of Dfinal, Dpiscale and Tform?  Sobol
+# indices are estimated with Saltelli's scheme: two quasi-random sample
+# matrices A and B, and for every input i the matrix AB_i, which is A
+# with column i taken from B.  The rows are evaluated by crater.batch()
+# in blocks on a process pool.  A block only sends back sums over its
+# rows, for the estimate itself and for every bootstrap resample (with
+# Poisson(1) row weights), so memory does not grow with the number of
+# evaluations.  Morris elementary effects give a cheaper screening.
+#
+#   python cratersens.py --evaluations 10000000 --log
+
+import argparse
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+import crater
+
+# inputs: (name, low, high, scale), scale 'linear', 'log' or 'discrete'
+# (integers low..high-1)
+BOUNDS = (
+    ('L', 1., 1000., 'log'),
+    ('v', 11.2, 72., 'linear'),
+    ('theta', 5., 90., 'linear'),
+    ('projectileDensity', 1000., 8000., 'linear'),
+    ('targetDensity', 1000., 3000., 'linear'),
+    ('g', 1., 10., 'linear'),
+    ('targtype', 0, 3, 'discrete'),
+)
+
+OUTPUTS = ('Dfinal', 'Dpiscale', 'Tform')
+
+BLOCK = 1 << 14   # sample rows per task
+RESAMPLES = 200   # bootstrap resamples
+
+# Sobol direction numbers (Joe and Kuo 2008, new-joe-kuo-6.21201) for
+# dimensions 2 and up: (s, a, m_1..m_s)
+DIRECTIONS = (
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)),
+    (6, 16, (1, 3, 1, 13, 27, 49)),
+)
+
+
+def _directions(dims):
+    # (dims, 32) direction integers
+    if dims > len(DIRECTIONS)+1:
+        raise ValueError('at most %d dimensions' % (len(DIRECTIONS)+1))
+    V = np.zeros((dims, 32), dtype=np.uint64)
+    V[0] = 1 << (31-np.arange(32, dtype=np.uint64))
+    for d, (s, a, m) in zip(range(1, dims), DIRECTIONS):
+        v = [int(m[b]) << (31-b) for b in range(s)]
+        for b in range(s, 32):
+            x = v[b-s] ^ (v[b-s] >> s)
+            for k in range(1, s):
+                if (a >> (s-1-k)) & 1:
+                    x ^= v[b-k]
+            v.append(x)
+        V[d] = v
+    return V
+
+
+def sobol(lo, hi, dims, shift=None):
+    """Rows lo..hi-1 of the dims-dimensional Sobol sequence in [0, 1),
+    in Gray code order.  shift is an optional array of dims 32-bit
+    integers XORed into the points, a random digital shift."""
+    i = np.arange(lo, hi, dtype=np.uint64)
+    gray = i ^ (i >> np.uint64(1))
+    V = _directions(dims)
+    x = np.zeros((i.size, dims), dtype=np.uint64)
+    for b in range(int(gray.max()).bit_length() if i.size else 0):
+        on = ((gray >> np.uint64(b)) & np.uint64(1)).astype(bool)
+        x[on] ^= V[:, b]
+    if shift is not None:
+        x ^= np.asarray(shift, dtype=np.uint64)
+    return x/2.**32
+
+
+def scale(u, bounds=BOUNDS):
+    """The crater.batch() keyword arguments for unit cube rows u."""
+    args = {}
+    for j, (name, lo, hi, kind) in enumerate(bounds):
+        x = u[..., j]
+        if kind == 'log':
+            args[name] = lo*(hi/float(lo))**x
+        elif kind == 'discrete':
+            args[name] = lo+np.minimum((x*(hi-lo)).astype(int), hi-lo-1)
+        else:
+            args[name] = lo+(hi-lo)*x
+    return args
+
+
+def evaluate(u, bounds=BOUNDS, outputs=OUTPUTS, log=False):
+    """crater.batch() of unit cube rows u, as a (rows, outputs) array,
+    log10 of the outputs with log=True."""
+    out = crater.batch(**scale(u, bounds))
+    f = np.stack([np.asarray(out[k], dtype=float) for k in outputs], axis=-1)
+    return np.log10(f) if log else f
+
+
+def _terms(fA, fB, fAB):
+    # per row and output: 1, fA, fB, fA**2, fB**2, then for every input
+    # fB*(fAB_i-fA) and (fA-fAB_i)**2, flattened to (rows, outputs*(5+2k))
+    t = [np.ones_like(fA), fA, fB, fA*fA, fB*fB]
+    t += [fB*(f-fA) for f in fAB]
+    t += [(fA-f)**2 for f in fAB]
+    return np.stack(t, axis=-1).reshape(fA.shape[0], -1)
+
+
+def _work(task):
+    lo, hi, bounds, outputs, log, shift, seed, resamples = task
+    k = len(bounds)
+    u = sobol(lo, hi, 2*k, shift)
+    A, B = u[:, :k], u[:, k:]
+    AB = np.repeat(A[None], k, axis=0)
+    AB[np.arange(k), :, np.arange(k)] = B.T
+    f = evaluate(np.concatenate((A[None], B[None], AB)), bounds, outputs, log)
+    T = _terms(f[0], f[1], f[2:])
+    w = np.ones((resamples+1, hi-lo))
+    w[1:] = np.random.default_rng([seed, lo]).poisson(1., (resamples, hi-lo))
+    return w @ T
+
+
+def _indices(sums, k, outputs):
+    # first order (Saltelli 2010) and total (Jansen 1999) indices from
+    # the row sums; leading axes are kept
+    s = sums.reshape(sums.shape[:-1]+(len(outputs), 5+2*k))
+    n, sA, sB, qA, qB = [s[..., j] for j in range(5)]
+    var = (qA+qB)/(2*n)-((sA+sB)/(2*n))**2
+    S1 = s[..., 5:5+k]/n[..., None]/var[..., None]
+    ST = 0.5*s[..., 5+k:]/n[..., None]/var[..., None]
+    return S1, ST, var
+
+
+def saltelli(samples=1 << 20, bounds=BOUNDS, outputs=OUTPUTS, log=False, resamples=RESAMPLES,
+             confidence=0.95, seed=0, workers=None, block=BLOCK, progress=None):
+    """Sobol indices of the crater outputs over the inputs in bounds.
+
+    samples rows of A and B (a power of two is best) cost
+    samples*(len(bounds)+2) model evaluations.  Returns a dict keyed by
+    output of dicts with 'S1' and 'ST', the first order and total
+    indices in the order of bounds, their bootstrap confidence
+    intervals 'S1_conf' and 'ST_conf' as (k, 2) arrays, and 'var', the
+    output variance.  With log=True the indices are those of log10 of
+    the outputs.  The Sobol points have a random digital shift from
+    seed; progress(done, total) is called as blocks finish."""
+    k = len(bounds)
+    shift = np.random.default_rng([seed]).integers(0, 1 << 32, 2*k, dtype=np.uint64)
+    tasks = [(lo, min(lo+block, samples), bounds, outputs, log, shift, seed, resamples)
+             for lo in range(0, samples, block)]
+    sums = 0.
+    done = 0
+    with Pool(workers) as pool:
+        for s in pool.imap_unordered(_work, tasks):
+            sums = sums+s
+            done += 1
+            if progress:
+                progress(done, len(tasks))
+    S1, ST, var = _indices(sums, k, outputs)
+    q = 50*(1-confidence), 50*(1+confidence)
+    result = {}
+    for o, name in enumerate(outputs):
+        result[name] = {
+            'names': [b[0] for b in bounds],
+            'S1': S1[0, o], 'ST': ST[0, o], 'var': var[0, o],
+            'S1_conf': np.percentile(S1[1:, o], q, axis=0).T,
+            'ST_conf': np.percentile(ST[1:, o], q, axis=0).T,
+        }
+    return result
+
+
+def morris(trajectories=1000, levels=4, bounds=BOUNDS, outputs=OUTPUTS, log=False, seed=0):
+    """Morris screening from elementary effects on a levels-point grid.
+
+    Returns a dict keyed by output of dicts with 'mu', 'mu_star' and
+    'sigma' per input, the mean, mean absolute value and standard
+    deviation of the elementary effects, in unit cube scale; costs
+    trajectories*(len(bounds)+1) evaluations."""
+    k = len(bounds)
+    rng = np.random.default_rng([seed])
+    delta = levels/(2.*(levels-1))
+    base = rng.integers(0, levels//2, (trajectories, k))/(levels-1.)
+    sign = rng.choice((-1., 1.), (trajectories, k))
+    order = np.argsort(rng.random((trajectories, k)), axis=1)
+    # step s moves input order[:, s] by sign*delta
+    x = np.repeat((base+delta*(sign < 0))[:, None], k+1, axis=1)
+    rows = np.arange(trajectories)
+    for s in range(k):
+        j = order[:, s]
+        x[rows, s+1:, j] += sign[rows, j][:, None]*delta
+    f = evaluate(x, bounds, outputs, log)
+    ee = np.empty((trajectories, k, len(outputs)))
+    ee[rows[:, None], order] = (f[:, 1:]-f[:, :-1])/(np.take_along_axis(sign, order, 1)*delta)[..., None]
+    result = {}
+    for o, name in enumerate(outputs):
+        e = ee[..., o]
+        result[name] = {'names': [b[0] for b in bounds], 'mu': e.mean(0),
+                        'mu_star': np.abs(e).mean(0), 'sigma': e.std(0, ddof=1)}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sobol and Morris sensitivity of the crater outputs')
+    parser.add_argument('--evaluations', type=float, default=1e7, help='model evaluations for Sobol')
+    parser.add_argument('--morris', type=int, default=0, help='Morris trajectories instead of Sobol')
+    parser.add_argument('--resamples', type=int, default=RESAMPLES, help='bootstrap resamples')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, all cores by default')
+    parser.add_argument('--log', action='store_true', help='indices of log10 of the outputs')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args(argv)
+    if args.morris:
+        result = morris(args.morris, log=args.log, seed=args.seed)
+        for name, r in result.items():
+            print('%s\n%-18s %10s %10s %10s' % (name, 'input', 'mu', 'mu*', 'sigma'))
+            for row in zip(r['names'], r['mu'], r['mu_star'], r['sigma']):
+                print('%-18s %10.4g %10.4g %10.4g' % row)
+        return
+    samples = max(1, int(args.evaluations//(len(BOUNDS)+2)))
+    result = saltelli(samples, log=args.log, resamples=args.resamples, seed=args.seed,
+                      workers=args.workers,
+                      progress=lambda i, n: print('\r%d/%d blocks' % (i, n), end='', file=sys.stderr))
+    print(file=sys.stderr)
+    for name, r in result.items():
+        print('%s\n%-18s %20s %20s' % (name, 'input', 'S1', 'ST'))
+        for i, b in enumerate(r['names']):
+            print('%-18s %6.3f [%5.3f,%5.3f] %6.3f [%5.3f,%5.3f]' % (
+                b, r['S1'][i], r['S1_conf'][i, 0], r['S1_conf'][i, 1],
+                r['ST'][i], r['ST_conf'][i, 0], r['ST_conf'][i, 1]))
+
+
+if __name__ == '__main__':
+    main()
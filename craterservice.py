@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+# The crater calculator as a local HTTP/JSON service, in place of the
+# web form of cCalc003Crater.py.  Scenarios are posted as JSON, one
+# object or a list of them, with the form's inputs or a preset name.
+# Requests arriving within a few milliseconds of each other are
+# coalesced into one crater.batch() call, and results are kept in an
+# LRU cache keyed on the normalized inputs, so popular presets cost a
+# dictionary lookup.
+#
+#   python craterservice.py --port 8080
+#   curl -d '{"preset": "meteor"}' localhost:8080/crater
+#   curl -d '[{"L": 100, "v": 20}, {"preset": "lunar", "L": 50}]' localhost:8080/crater
+#   curl localhost:8080/metrics
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+import urllib.parse
+
+import numpy as np
+
+import crater
+import cratereffects
+
+# the form inputs, in the order of the cache key
+KEYS = ('L', 'v', 'theta', 'projectileDensity', 'targetDensity', 'g', 'targtype', 'effectRadius')
+
+DEFAULTS = dict(theta=45., projectileDensity=3000., targetDensity=2500., g=crater.gEarth,
+                targtype=2, effectRadius=10.)
+
+PRESETS = {
+    'meteor': dict(crater.METEOR),
+    'chicxulub': dict(L=10000., v=20., theta=60., projectileDensity=3000., targetDensity=2700.,
+                      g=crater.gEarth, targtype=2),
+    'lunar': dict(L=1000., v=18., theta=45., projectileDensity=3000., targetDensity=crater.rhomoon,
+                  g=crater.gmoon, targtype=2),
+}
+
+# the form's results, as named in the script
+RESULTS = ('impactorVolume', 'cratertype', 'impactorMass', 'Dyield', 'continEjectaBlanket',
+           'projectileKE', 'Dpiscale', 'ejectaSpread', 'megatons', 'Dgault', 'M', 'nL', 'mEff',
+           'Dfinal', 'Tform')
+
+CACHE = 4096      # cached scenarios
+WINDOW = 0.002    # s to wait for more requests before evaluating
+MAX_BATCH = 1 << 14
+LATENCIES = 10000  # recent request latencies kept for the percentiles
+
+
+def normalize(scenario):
+    """The cache key of a scenario: the KEYS values as a tuple, from a
+    preset if one is named, the defaults and the given values.  Raises
+    ValueError unless the inputs are finite and positive, with theta in
+    (0, 90] degrees."""
+    if not isinstance(scenario, dict):
+        raise ValueError('a scenario is a JSON object')
+    s = dict(DEFAULTS)
+    if 'preset' in scenario:
+        if scenario['preset'] not in PRESETS:
+            raise ValueError('unknown preset %r, one of %s' % (
+                scenario['preset'], ', '.join(sorted(PRESETS))))
+        s.update(PRESETS[scenario['preset']])
+    unknown = set(scenario)-set(KEYS)-{'preset'}
+    if unknown:
+        raise ValueError('unknown inputs: %s' % ', '.join(sorted(unknown)))
+    s.update(scenario)
+    for k in ('L', 'v'):
+        if k not in s:
+            raise ValueError('%s is required' % k)
+    key = tuple(float(s[k]) for k in KEYS)
+    for k, x in zip(KEYS, key):
+        if k not in ('theta', 'targtype') and not (np.isfinite(x) and x > 0):
+            raise ValueError('%s must be finite and positive' % k)
+    if not 0 < key[2] <= 90:
+        raise ValueError('theta must be in (0, 90] degrees')
+    if key[6] not in (0., 1., 2.):
+        raise ValueError('targtype must be 0 (water), 1 (sand) or 2 (rock)')
+    return key[:6]+(int(key[6]),)+key[7:]
+
+
+def evaluate(keys):
+    """Results of a list of normalized scenarios, in one batch."""
+    cols = np.array(keys, dtype=float).reshape(-1, len(KEYS)).T
+    L, v, theta, rhop, rhot, g, targtype, r = cols
+    out = crater.batch(L, v, theta, rhop, rhot, g, targtype.astype(int))
+    out['M'] = cratereffects.magnitude(out['projectileKE'])
+    out['mEff'] = cratereffects.effective_magnitude(out['M'], r)
+    names = crater.names(out['cratertype'])
+    results = []
+    for i in range(len(keys)):
+        res = {k: float(out[k][i]) for k in RESULTS if k != 'cratertype'}
+        res['cratertype'] = str(names[i])
+        results.append(res)
+    return results
+
+
+class Service(object):
+    """Coalesces concurrent scenario requests into batches, behind an
+    LRU cache of results."""
+
+    def __init__(self, cache=CACHE, window=WINDOW, max_batch=MAX_BATCH):
+        self.size = cache
+        self.window = window
+        self.max_batch = max_batch
+        self.cache = collections.OrderedDict()
+        self.inflight = {}   # key: future of a pending evaluation
+        self.pending = []
+        self.timer = None
+        self.hits = self.misses = 0
+        self.batches = self.evaluated = 0
+        self.requests = self.errors = 0
+        self.latencies = collections.deque(maxlen=LATENCIES)
+
+    async def scenarios(self, scenarios):
+        """Results of a list of scenarios, cached or batched."""
+        keys = [normalize(s) for s in scenarios]
+        loop = asyncio.get_running_loop()
+        futures = []
+        for key in keys:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                f = loop.create_future()
+                f.set_result(self.cache[key])
+            elif key in self.inflight:
+                # the same scenario is already on its way
+                self.hits += 1
+                f = self.inflight[key]
+            else:
+                self.misses += 1
+                f = self.inflight[key] = loop.create_future()
+                self.pending.append(key)
+            # shielded, as other requests may be waiting on the same
+            # future, and cancelling this one must not cancel theirs
+            futures.append(asyncio.shield(f))
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif self.pending and self.timer is None:
+            self.timer = loop.call_later(self.window, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        keys, self.pending = self.pending, []
+        if not keys:
+            return
+        futures = {}
+        try:
+            for key in keys:
+                futures[key] = self.inflight.pop(key)
+            try:
+                results = evaluate(keys)
+            except Exception as e:
+                for f in futures.values():
+                    if not f.done():
+                        f.set_exception(e)
+                return
+            self.batches += 1
+            self.evaluated += len(keys)
+            for key, res in zip(keys, results):
+                self.cache[key] = res
+                if not futures[key].done():
+                    futures[key].set_result(res)
+        finally:
+            # no batched key is left in flight, whatever happened
+            for key in keys:
+                self.inflight.pop(key, None)
+        while len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+
+    def metrics(self):
+        lookups = self.hits+self.misses
+        lat = np.array(self.latencies)
+        p = np.percentile(lat, (50, 90, 99)) if lat.size else (None,)*3
+        return {
+            'requests': self.requests, 'errors': self.errors,
+            'scenarios': lookups, 'cache_hits': self.hits, 'cache_misses': self.misses,
+            'cache_hit_rate': self.hits/lookups if lookups else None,
+            'cache_size': len(self.cache), 'batches': self.batches,
+            'mean_batch': self.evaluated/self.batches if self.batches else None,
+            'latency_ms': dict(zip(('p50', 'p90', 'p99'), [None if x is None else float(x) for x in p])),
+        }
+
+    async def request(self, method, path, body):
+        """(status, JSON-able reply) of one HTTP request."""
+        url = urllib.parse.urlsplit(path)
+        if url.path == '/metrics' and method == 'GET':
+            return 200, self.metrics()
+        if url.path == '/presets' and method == 'GET':
+            return 200, PRESETS
+        if url.path != '/crater':
+            return 404, {'error': 'no such path %s' % url.path}
+        if method == 'GET':
+            data = dict(urllib.parse.parse_qsl(url.query))
+        elif method == 'POST':
+            data = json.loads(body or b'null')
+        else:
+            return 405, {'error': 'use GET or POST'}
+        if isinstance(data, dict) and 'scenarios' in data:
+            data = data['scenarios']
+        if isinstance(data, list):
+            return 200, await self.scenarios(data)
+        return 200, (await self.scenarios([data]))[0]
+
+    async def handle(self, reader, writer):
+        # HTTP/1.1 with keep-alive, one request at a time per connection
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                start = time.perf_counter()
+                method, path, version = line.decode('latin1').split(None, 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if not h.strip():
+                        break
+                    k, _, value = h.decode('latin1').partition(':')
+                    headers[k.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                self.requests += 1
+                try:
+                    status, reply = await self.request(method, path, body)
+                except (ValueError, TypeError, KeyError) as e:
+                    status, reply = 400, {'error': str(e)}
+                if status != 200:
+                    self.errors += 1
+                data = json.dumps(reply).encode()
+                close = headers.get('connection', '').lower() == 'close' or version.strip() == 'HTTP/1.0'
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\n%s\r\n' % (
+                                 status, STATUS[status], len(data),
+                                 b'Connection: close\r\n' if close else b'') + data)
+                await writer.drain()
+                self.latencies.append(1000*(time.perf_counter()-start))
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+STATUS = {200: b'OK', 400: b'Bad Request', 404: b'Not Found', 405: b'Method Not Allowed'}
+
+
+async def serve(host='127.0.0.1', port=8080, **kwargs):
+    """Run the service until cancelled."""
+    service = Service(**kwargs)
+    server = await asyncio.start_server(service.handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crater calculator HTTP/JSON service')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('--cache', type=int, default=CACHE, help='cached scenarios')
+    parser.add_argument('--window', type=float, default=WINDOW, help='seconds to gather a batch')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, cache=args.cache, window=args.window))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
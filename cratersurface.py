@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+# Synthetic cratered surfaces for crater-count ages and saturation.
+# Craters land on a square, periodic patch of surface in order of
+# formation.  A new crater erases every older, no larger crater whose
+# centre lies inside its rim, and degrades the ones whose centre lies
+# under its continuous ejecta blanket.  Craters are found through a
+# spatial hash: the centres of the surviving craters are bucketed on a
+# uniform grid, and each new crater only looks at the buckets its
+# blanket reaches.  Since these rules only depend on the positions and
+# order of pairs of craters, a whole chunk of new craters is matched
+# against the survivors, and against each other, in one vectorized
+# pass.
+#
+#   python cratersurface.py --impacts 10000000 --size 1e5 --Lmin 2
+
+import argparse
+import sys
+
+import numpy as np
+
+import crater
+import craterpop
+
+CHUNK = 1 << 16  # craters added per pass
+PAIRS = 1 << 22  # candidate pairs examined at a time
+
+
+class Surface(object):
+    """A square surface of side size m with periodic edges.
+
+    Each crater keeps its position, Dfinal, blanket radius, formation
+    index and the number of times it has been degraded.  With
+    degrade_limit, a crater degraded that many times is erased as
+    well."""
+
+    def __init__(self, size=1e5, degrade_limit=None):
+        self.size = float(size)
+        self.degrade_limit = degrade_limit
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.D = np.empty(0)
+        self.R = np.empty(0)
+        self.index = np.empty(0, dtype=np.int64)
+        self.degraded = np.empty(0, dtype=np.int64)
+        self.formed = 0
+        self.erased = 0
+        self.history = []   # (formed, visible) after every add()
+
+    def __len__(self):
+        return self.D.size
+
+    def _grid(self, x, y):
+        # bucket the centres: cell sort order, and CSR starts of each cell
+        n = int(np.clip(np.sqrt(x.size/2.), 1, 2048))
+        cell = self.size/n
+        cx = np.minimum((x/cell).astype(np.int64), n-1)
+        cy = np.minimum((y/cell).astype(np.int64), n-1)
+        cid = cx*n+cy
+        order = np.argsort(cid, kind='stable')
+        starts = np.searchsorted(cid[order], np.arange(n*n+1))
+        return n, cell, order, starts
+
+    def _pairs(self, qx, qy, qR, n, cell, order, starts):
+        # yield (query, target) index pairs of targets bucketed within
+        # reach qR of each query, a block of queries at a time
+        k = np.ceil(qR/cell).astype(np.int64)
+        w = np.minimum(2*k+1, n)
+        k = np.where(w == n, (n-1)//2, k)
+        if not qR.size:
+            return
+        # rough number of candidates of each query
+        cum = np.cumsum((starts[-1]/float(n*n)+1.)*w*w)
+        cuts = np.searchsorted(cum, np.arange(PAIRS, cum[-1], PAIRS))
+        cuts = np.unique(np.concatenate(([0], cuts, [qR.size])))
+        for lo, hi in zip(cuts[:-1], cuts[1:]):
+            q = np.arange(lo, hi)
+            ww = w[q]*w[q]
+            src = np.repeat(q, ww)
+            local = np.arange(src.size)-np.repeat(np.cumsum(ww)-ww, ww)
+            cx = (qx[src]/cell).astype(np.int64)+local//w[src]-k[src]
+            cy = (qy[src]/cell).astype(np.int64)+local % w[src]-k[src]
+            cid = (cx % n)*n+cy % n
+            a, b = starts[cid], starts[cid+1]
+            m = b-a
+            qi = np.repeat(src, m)
+            pos = np.repeat(a-np.cumsum(m)+m, m)+np.arange(m.sum())
+            yield qi, order[pos]
+
+    def add(self, x, y, Dfinal, blanket=None):
+        """Add craters at (x, y) with final diameters Dfinal, in order
+        of formation.  blanket is the continuous ejecta blanket
+        diameter, continEjectaBlanket, 2*Dfinal by default."""
+        x = np.mod(np.asarray(x, dtype=float).ravel(), self.size)
+        y = np.mod(np.asarray(y, dtype=float).ravel(), self.size)
+        D = np.asarray(Dfinal, dtype=float).ravel()
+        R = 0.5*(2*D if blanket is None else np.asarray(blanket, dtype=float).ravel())
+        index = self.formed+np.arange(D.size)
+
+        X = np.concatenate((self.x, x))
+        Y = np.concatenate((self.y, y))
+        DD = np.concatenate((self.D, D))
+        RR = np.concatenate((self.R, R))
+        I = np.concatenate((self.index, index))
+        deg = np.concatenate((self.degraded, np.zeros(D.size, dtype=np.int64)))
+        gone = np.zeros(DD.size, dtype=bool)
+        new = np.arange(len(self), DD.size)
+
+        grid = self._grid(X, Y)
+        for qi, j in self._pairs(x, y, np.maximum(R, 0.5*D), *grid):
+            i = new[qi]
+            older = I[j] < I[i]
+            qi, i, j = qi[older], i[older], j[older]
+            dx = np.abs(X[j]-x[qi])
+            dy = np.abs(Y[j]-y[qi])
+            dx = np.minimum(dx, self.size-dx)
+            dy = np.minimum(dy, self.size-dy)
+            d2 = dx*dx+dy*dy
+            rim = 0.5*D[qi]
+            hit = (d2 < rim*rim) & (DD[j] <= D[qi])
+            gone[j[hit]] = True
+            under = ~hit & (d2 < R[qi]*R[qi])
+            deg += np.bincount(j[under], minlength=DD.size)
+        if self.degrade_limit is not None:
+            gone |= deg >= self.degrade_limit
+
+        keep = ~gone
+        self.x, self.y, self.D, self.R = X[keep], Y[keep], DD[keep], RR[keep]
+        self.index, self.degraded = I[keep], deg[keep]
+        self.formed += D.size
+        self.erased += int(gone.sum())
+        self.history.append((self.formed, len(self)))
+
+    def counts(self, edges):
+        """Cumulative size-frequency distribution of the visible craters:
+        the number per km^2 with Dfinal at least each edge (m)."""
+        edges = np.asarray(edges, dtype=float)
+        D = np.sort(self.D)
+        n = D.size-np.searchsorted(D, edges)
+        return n/(self.size/1000.)**2
+
+
+def bombard(surface, impacts, Lmin=1., Lmax=1e4, v=craterpop.velocities, theta=craterpop.angles,
+            projectileDensity=craterpop.densities, targetDensity=crater.rhomoon, g=crater.gmoon,
+            targtype=2, seed=0, chunk=CHUNK):
+    """Add impacts craters to surface, from impactors drawn as in
+    craterpop.simulate() and scaled by crater.batch(), at uniformly
+    random positions.  The defaults are lunar.  Chunk i uses its own
+    random stream keyed by the seed and i."""
+    for i, lo in enumerate(range(0, impacts, chunk)):
+        size = min(chunk, impacts-lo)
+        rng = np.random.default_rng([seed, i+1])
+        L = craterpop.diameters(rng, size, Lmin, Lmax)
+        args = [craterpop._draw(x, rng, size) for x in (v, theta, projectileDensity, targetDensity, g)]
+        tt = craterpop._draw(targtype, rng, size).astype(int)
+        out = crater.batch(L, *args, targtype=tt)
+        pos = rng.random((2, size))*surface.size
+        surface.add(pos[0], pos[1], out['Dfinal'], out['continEjectaBlanket'])
+    return surface
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bombard a synthetic surface until saturation')
+    parser.add_argument('--impacts', type=int, default=1000000, help='number of impacts')
+    parser.add_argument('--size', type=float, default=1e5, help='side of the surface in m')
+    parser.add_argument('--Lmin', type=float, default=1., help='smallest impactor in m')
+    parser.add_argument('--Lmax', type=float, default=1e4, help='largest impactor in m')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--degrade-limit', type=int, default=None,
+                        help='erase craters degraded this many times')
+    parser.add_argument('--output', default=None, help='.npz file for the visible craters')
+    args = parser.parse_args(argv)
+    surface = Surface(args.size, args.degrade_limit)
+    bombard(surface, args.impacts, args.Lmin, args.Lmax, seed=args.seed)
+    print('%d craters formed, %d erased, %d visible' % (surface.formed, surface.erased, len(surface)))
+    edges = np.logspace(1, 5, 9)
+    for D, n in zip(edges, surface.counts(edges)):
+        print('N(>%8.4g m) = %.4g per km^2' % (D, n))
+    if args.output:
+        np.savez(args.output, x=surface.x, y=surface.y, Dfinal=surface.D, index=surface.index,
+                 degraded=surface.degraded, history=np.array(surface.history))
+        print('visible craters written to %s' % args.output, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
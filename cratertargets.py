@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+# Target presets for the crater scaling, by body and material.
+# The target-dependent factors of the scaling laws (Dstar and Dpr from
+# the lunar transition diameters, the gravity corrections of yield and
+# Gault scaling, Cd, beta and Ct, and the target density term of
+# densfac) are computed once per (body, material, density) and reused
+# by every batch on that target.  New materials and bodies are
+# registered here rather than by editing the crater.Cd and crater.beta
+# arrays.
+#
+#   import cratertargets
+#   out = cratertargets.batch(L, v, 'europa')           # ice
+#   out = cratertargets.batch(L, v, 'mars', 'soil')
+
+from functools import lru_cache
+
+import crater
+
+# name: Cd, beta, Ct, density (kg/m^3), and which Gault law applies
+MATERIALS = {
+    'water': dict(Cd=crater.Cd[0], beta=crater.beta[0], Ct=crater.Ct[0], density=1000., gault='soil'),
+    'soil': dict(Cd=crater.Cd[1], beta=crater.beta[1], Ct=crater.Ct[1], density=1600., gault='soil'),
+    'rock': dict(Cd=crater.Cd[2], beta=crater.beta[2], Ct=crater.Ct[2], density=2500., gault='rock'),
+    # cold ice scales like competent rock (Schmidt and Housen 1987)
+    'ice': dict(Cd=crater.Cd[2], beta=crater.beta[2], Ct=crater.Ct[2], density=920., gault='rock'),
+}
+
+# name: surface gravity (m/s^2), default material and, if it is not
+# that of the material, the target density
+BODIES = {
+    'earth': dict(g=crater.gEarth, material='rock'),
+    'moon': dict(g=crater.gmoon, material='rock', density=crater.rhomoon),
+    'mars': dict(g=3.71, material='rock'),
+    'mercury': dict(g=3.70, material='rock'),
+    'europa': dict(g=1.315, material='ice'),
+    'ganymede': dict(g=1.428, material='ice'),
+    'callisto': dict(g=1.235, material='ice'),
+    'titan': dict(g=1.352, material='ice'),
+    'enceladus': dict(g=0.113, material='ice'),
+}
+
+
+class Target(object):
+    """A body and target material with the crater.target_factors() of
+    the pair in factors."""
+
+    def __init__(self, body, material, g, density, factors):
+        self.body = body
+        self.material = material
+        self.g = g
+        self.density = density
+        self.factors = factors
+
+    def __repr__(self):
+        return 'Target(%r, %r, g=%g, density=%g)' % (self.body, self.material, self.g, self.density)
+
+
+@lru_cache(maxsize=None)
+def target(body='earth', material=None, density=None):
+    """The Target of a registered body, in its own material by default.
+    density overrides the target density of the material."""
+    if body not in BODIES:
+        raise ValueError('unknown body %r, one of %s' % (body, ', '.join(sorted(BODIES))))
+    b = BODIES[body]
+    if material is None:
+        material = b['material']
+        if density is None:
+            density = b.get('density')
+    if material not in MATERIALS:
+        raise ValueError('unknown material %r, one of %s' % (material, ', '.join(sorted(MATERIALS))))
+    m = MATERIALS[material]
+    density = float(m['density'] if density is None else density)
+    factors = crater.target_factors(density, b['g'], 2 if m['gault'] == 'rock' else 1)
+    factors.update(Cd=float(m['Cd']), beta=float(m['beta']), Ct=float(m['Ct']))
+    return Target(body, material, float(b['g']), density, factors)
+
+
+def register_material(name, Cd, beta, Ct=0.8, density=2500., gault='rock'):
+    """Add or replace a target material.  gault is 'rock' or 'soil',
+    the Gault (1974) law to use."""
+    if gault not in ('rock', 'soil'):
+        raise ValueError("gault must be 'rock' or 'soil'")
+    MATERIALS[name] = dict(Cd=float(Cd), beta=float(beta), Ct=float(Ct), density=float(density), gault=gault)
+    target.cache_clear()
+
+
+def register_body(name, g, material='rock', density=None):
+    """Add or replace a body with surface gravity g m/s^2, made of a
+    registered material."""
+    if material not in MATERIALS:
+        raise ValueError('unknown material %r' % material)
+    BODIES[name] = dict(g=float(g), material=material)
+    if density is not None:
+        BODIES[name]['density'] = float(density)
+    target.cache_clear()
+
+
+def batch(L, v, body='earth', material=None, theta=45., projectileDensity=3000., density=None):
+    """crater.batch() on a preset target: body is a registered body
+    name or a Target, and the other inputs are as for crater.batch()."""
+    t = body if isinstance(body, Target) else target(body, material, density)
+    return crater.scale(L, v, theta, projectileDensity, t.factors)
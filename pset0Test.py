@@ -1,176 +1,180 @@
 #!/usr/bin/env python
 
+import json
+import socketserver
 import sys
-from math import *
-
-try:
-    if sys.argv[1] == '-h':
-    print '''Cosmology calculator ala Ned Wright (www.astro.ucla.edu/~wright)
-        input values = redshift, Ho, Omega_m, Omega_vac
-        ouput values = age at z, distance in Mpc, kpc/arcsec, apparent to abs mag conversion
-        
-        Options:   -h for this message
-        -v for verbose response '''
-    sys.exit()
-        if sys.argv[1] == '-v':
-verbose=1
-    length=len(sys.argv)-1
-        else:
-verbose=0
-    length=len(sys.argv)
-        
-        # if no values, assume Benchmark Model, input is z
-        if length == 2:
-if float(sys.argv[1+verbose]) > 100:
-    z=float(sys.argv[1+verbose])/299790.    # velocity to redshift
+
+import numpy as np
+
+from cosmology import Tyr, c
+from cosmotable import Cosmology
+
+USAGE = '''Cosmology calculator ala Ned Wright (www.astro.ucla.edu/~wright)
+    input values = redshift, Ho, Omega_m, Omega_vac
+    ouput values = age at z, distance in Mpc, kpc/arcsec, apparent to abs mag conversion
+
+    Options:   -h for this message
+    -v for verbose response
+    -s to answer JSON-line requests on stdin
+    -s PATH to answer them on a Unix socket at PATH '''
+
+# keys of a server request, in command-line order
+KEYS = ('z', 'H0', 'WM', 'WV')
+
+# the values printed without -v
+BRIEF = ('zage_Gyr', 'DCMR_Mpc', 'kpc_DA', 'distmod')
+
+
+def _H0(value):
+    H0 = float(value)
+    if not (np.isfinite(H0) and H0 > 0):
+        raise ValueError('H0 must be positive')
+    return H0
+
+
+def params(values):
+    """(z, H0, WM, WV) from one to four command-line values."""
+    length = len(values)+1
+
+    # if no values, assume Benchmark Model, input is z
+    if length == 2:
+        z = np.asarray(values[0], dtype=float)
+        z = np.where(z > 100, z/299790., z)    # velocity to redshift
+        H0 = 75                         # Hubble constant
+        WM = 0.3                        # Omega(matter)
+        WV = 1.0 - WM - 0.4165/(H0*H0)  # Omega(vacuum) or lambda
+
+    # if one value, assume Benchmark Model with given Ho
+    elif length == 3:
+        z = np.asarray(values[0], dtype=float)    # redshift
+        H0 = _H0(values[1])             # Hubble constant
+        WM = 0.3                        # Omega(matter)
+        WV = 1.0 - WM - 0.4165/(H0*H0)  # Omega(vacuum) or lambda
+
+    # if Univ is Open, use Ho, Wm and set Wv to 0.
+    elif length == 4:
+        z = np.asarray(values[0], dtype=float)    # redshift
+        H0 = _H0(values[1])             # Hubble constant
+        WM = float(values[2])           # Omega(matter)
+        WV = 0.0                        # Omega(vacuum) or lambda
+
+    # if Univ is General, use Ho, Wm and given Wv
+    elif length == 5:
+        z = np.asarray(values[0], dtype=float)    # redshift
+        H0 = _H0(values[1])             # Hubble constant
+        WM = float(values[2])           # Omega(matter)
+        WV = float(values[3])           # Omega(vacuum) or lambda
+
+    # or else fail
     else:
-        z=float(sys.argv[1+verbose])            # redshift
-    H0 = 75                         # Hubble constant
-    WM = 0.3                        # Omega(matter)
-    WV = 1.0 - WM - 0.4165/(H0*H0)  # Omega(vacuum) or lambda
-        
-        # if one value, assume Benchmark Model with given Ho
-        elif length == 3:
-z=float(sys.argv[1+verbose])    # redshift
-    H0 = float(sys.argv[2+verbose]) # Hubble constant
-    WM = 0.3                        # Omega(matter)
-    WV = 1.0 - WM - 0.4165/(H0*H0)  # Omega(vacuum) or lambda
-        
-        # if Univ is Open, use Ho, Wm and set Wv to 0.
-        elif length == 4:
-z=float(sys.argv[1+verbose])    # redshift
-    H0 = float(sys.argv[2+verbose]) # Hubble constant
-    WM = float(sys.argv[3+verbose]) # Omega(matter)
-    WV = 0.0                        # Omega(vacuum) or lambda
-        
-        # if Univ is General, use Ho, Wm and given Wv
-        elif length == 5:
-z=float(sys.argv[1+verbose])    # redshift
-    H0 = float(sys.argv[2+verbose]) # Hubble constant
-    WM = float(sys.argv[3+verbose]) # Omega(matter)
-    WV = float(sys.argv[4+verbose]) # Omega(vacuum) or lambda
-        
-        # or else fail
+        raise IndexError(length)
+    if not np.all(np.isfinite(z) & (z > -1)):
+        raise ValueError('z must be finite and above -1')
+    return z, H0, WM, WV
+
+
+def report(z, H0, WM, WV, out):
+    """The verbose text for one redshift."""
+    DCMR_Gyr = out['DCMR_Mpc']*Tyr/c
+    DA_Gyr = out['DA_Mpc']*Tyr/c
+    DL_Gyr = out['DL_Mpc']*Tyr/c
+    return '\n'.join([
+        'For H_o = ' + '%1.1f' % H0 + ', Omega_M = ' + '%1.2f' % WM + ', Omega_vac = ' +
+        '%1.2f' % WV + ', z = ' + '%1.3f' % z,
+        'It is now ' + '%1.1f' % out['age_Gyr'] + ' Gyr since the Big Bang.',
+        'The age at redshift z was ' + '%1.1f' % out['zage_Gyr'] + ' Gyr.',
+        'The light travel time was ' + '%1.1f' % out['DTT_Gyr'] + ' Gyr.',
+        'The comoving radial distance, which goes into Hubbles law, is ' +
+        '%1.1f' % out['DCMR_Mpc'] + ' Mpc or ' + '%1.1f' % DCMR_Gyr + ' Gly.',
+        'The comoving volume within redshift z is ' + '%1.1f' % out['V_Gpc'] + ' Gpc^3.',
+        'The angular size distance D_A is ' + '%1.1f' % out['DA_Mpc'] + ' Mpc or ' +
+        '%1.1f' % DA_Gyr + ' Gly.',
+        'This gives a scale of ' + '%.2f' % out['kpc_DA'] + ' kpc/".',
+        'The luminosity distance D_L is ' + '%1.1f' % out['DL_Mpc'] + ' Mpc or ' +
+        '%1.1f' % DL_Gyr + ' Gly.',
+        'The distance modulus, m-M, is ' + '%1.2f' % out['distmod']])
+
+
+def answer(request):
+    """The JSON result of one request object, or of a list of them.
+
+    A request holds z (a number or a list), and optionally H0, WM and
+    WV, filled in by the same rules as the command-line values; with
+    "verbose": true every output column is returned."""
+    if isinstance(request, list):
+        return [answer(r) for r in request]
+    given = [k for k in KEYS if k in request]
+    if given != list(KEYS[:len(given)]):
+        raise ValueError('give z, H0, WM, WV in that order of precedence')
+    z, H0, WM, WV = params([request[k] for k in given])
+    # the tables of every cosmology seen so far stay cached
+    out = Cosmology(H0, WM, WV)(z)
+    keys = sorted(out) if request.get('verbose') else BRIEF
+    result = {'z': z.tolist(), 'H0': H0, 'WM': WM, 'WV': WV}
+    result.update((k, out[k].tolist()) for k in keys)
+    return result
+
+
+def serve(lines, write):
+    """Answer every JSON line read from lines with a JSON line."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            # bare NaN is not JSON, so results holding one are refused
+            reply = json.dumps(answer(json.loads(line)), allow_nan=False)
+        except (ValueError, TypeError, IndexError, KeyError, AttributeError, ArithmeticError) as e:
+            reply = json.dumps({'error': '%s: %s' % (type(e).__name__, e)})
+        write(reply + '\n')
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        def write(s):
+            self.wfile.write(s.encode())
+            self.wfile.flush()
+        serve((line.decode() for line in self.rfile), write)
+
+
+def serve_socket(path):
+    """Answer JSON-line requests from any number of clients on a Unix socket."""
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.serve_forever()
+
+
+def main(argv):
+    try:
+        if argv[1] == '-h':
+            print(USAGE)
+            return
+        if argv[1] == '-s':
+            if len(argv) > 2:
+                serve_socket(argv[2])
+            else:
+                def write(s):
+                    sys.stdout.write(s)
+                    sys.stdout.flush()
+                serve(sys.stdin, write)
+            return
+        if argv[1] == '-v':
+            verbose = 1
         else:
-print 'need some values or too many values'
-    sys.exit()
-        
-        # initialize constants
-        
-        WR = 0.        # Omega(radiation)
-            WK = 0.        # Omega curvaturve = 1-Omega(total)
-                c = 299792.458 # velocity of light in km/sec
-                    Tyr = 977.8    # coefficent for converting 1/H into Gyr
-                        DTT = 0.5      # time from z to now in units of 1/H0
-                            DTT_Gyr = 0.0  # value of DTT in Gyr
-                                age = 0.5      # age of Universe in units of 1/H0
-                                    age_Gyr = 0.0  # value of age in Gyr
-                                        zage = 0.1     # age of Universe at redshift z in units of 1/H0
-                                            zage_Gyr = 0.0 # value of zage in Gyr
-                                                DCMR = 0.0     # comoving radial distance in units of c/H0
-                                                    DCMR_Mpc = 0.0
-                                                        DCMR_Gyr = 0.0
-                                                            DA = 0.0       # angular size distance
-                                                                DA_Mpc = 0.0
-                                                                    DA_Gyr = 0.0
-                                                                        kpc_DA = 0.0
-                                                                            DL = 0.0       # luminosity distance
-                                                                                DL_Mpc = 0.0
-                                                                                    DL_Gyr = 0.0   # DL in units of billions of light years
-                                                                                        V_Gpc = 0.0
-                                                                                            a = 1.0        # 1/(1+z), the scale factor of the Universe
-                                                                                                az = 0.5       # 1/(1+z(object))
-                                                                                                    
-                                                                                                    h = H0/100.
-                                                                                                        WR = 4.165E-5/(h*h)   # includes 3 massless neutrino species, T0 = 2.72528
-                                                                                                            WK = 1-WM-WR-WV
-                                                                                                                az = 1.0/(1+1.0*z)
-                                                                                                                    age = 0.
-                                                                                                                        n=1000         # number of points in integrals
-                                                                                                                            for i in range(n):
-                                                                                                                                a = az*(i+0.5)/n
-                                                                                                                                    adot = sqrt(WK+(WM/a)+(WR/(a*a))+(WV*a*a))
-                                                                                                                                        age = age + 1./adot
-                                                                                                                                            
-                                                                                                                                            zage = az*age/n
-                                                                                                                                                zage_Gyr = (Tyr/H0)*zage
-                                                                                                                                                    DTT = 0.0
-                                                                                                                                                        DCMR = 0.0
-                                                                                                                                                            
-                                                                                                                                                            # do integral over a=1/(1+z) from az to 1 in n steps, midpoint rule
-                                                                                                                                                            for i in range(n):
-                                                                                                                                                                a = az+(1-az)*(i+0.5)/n
-                                                                                                                                                                    adot = sqrt(WK+(WM/a)+(WR/(a*a))+(WV*a*a))
-                                                                                                                                                                        DTT = DTT + 1./adot
-                                                                                                                                                                            DCMR = DCMR + 1./(a*adot)
-                                                                                                                                                                                
-                                                                                                                                                                                DTT = (1.-az)*DTT/n
-                                                                                                                                                                                    DCMR = (1.-az)*DCMR/n
-                                                                                                                                                                                        age = DTT+zage
-                                                                                                                                                                                            age_Gyr = age*(Tyr/H0)
-                                                                                                                                                                                                DTT_Gyr = (Tyr/H0)*DTT
-                                                                                                                                                                                                    DCMR_Gyr = (Tyr/H0)*DCMR
-                                                                                                                                                                                                        DCMR_Mpc = (c/H0)*DCMR
-                                                                                                                                                                                                            
-                                                                                                                                                                                                            # tangential comoving distance
-                                                                                                                                                                                                            
-                                                                                                                                                                                                            ratio = 1.00
-                                                                                                                                                                                                                x = sqrt(abs(WK))*DCMR
-                                                                                                                                                                                                                    if x > 0.1:
-                                                                                                                                                                                                                        if WK > 0:
-                                                                                                                                                                                                                            ratio =  0.5*(exp(x)-exp(-x))/x 
-                                                                                                                                                                                                                                else:
-                                                                                                                                                                                                                                    ratio = sin(x)/x
-                                                                                                                                                                                                                                        else:
-                                                                                                                                                                                                                                            y = x*x
-                                                                                                                                                                                                                                                if WK < 0: y = -y
-                                                                                                                                                                                                                                                    ratio = 1. + y/6. + y*y/120.
-                                                                                                                                                                                                                                                        DCMT = ratio*DCMR
-                                                                                                                                                                                                                                                            DA = az*DCMT
-                                                                                                                                                                                                                                                                DA_Mpc = (c/H0)*DA
-                                                                                                                                                                                                                                                                    kpc_DA = DA_Mpc/206.264806
-                                                                                                                                                                                                                                                                        DA_Gyr = (Tyr/H0)*DA
-                                                                                                                                                                                                                                                                            DL = DA/(az*az)
-                                                                                                                                                                                                                                                                                DL_Mpc = (c/H0)*DL
-                                                                                                                                                                                                                                                                                    DL_Gyr = (Tyr/H0)*DL
-                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                        # comoving volume computation
-                                                                                                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                                                        ratio = 1.00
-                                                                                                                                                                                                                                                                                            x = sqrt(abs(WK))*DCMR
-                                                                                                                                                                                                                                                                                                if x > 0.1:
-                                                                                                                                                                                                                                                                                                    if WK > 0:
-                                                                                                                                                                                                                                                                                                        ratio = (0.125*(exp(2.*x)-exp(-2.*x))-x/2.)/(x*x*x/3.)
-                                                                                                                                                                                                                                                                                                            else:
-                                                                                                                                                                                                                                                                                                                ratio = (x/2. - sin(2.*x)/4.)/(x*x*x/3.)
-                                                                                                                                                                                                                                                                                                                    else:
-                                                                                                                                                                                                                                                                                                                        y = x*x
-                                                                                                                                                                                                                                                                                                                            if WK < 0: y = -y
-                                                                                                                                                                                                                                                                                                                                ratio = 1. + y/5. + (2./105.)*y*y
-                                                                                                                                                                                                                                                                                                                                    VCM = ratio*DCMR*DCMR*DCMR/3.
-                                                                                                                                                                                                                                                                                                                                        V_Gpc = 4.*pi*((0.001*c/H0)**3)*VCM
-                                                                                                                                                                                                                                                                                                                                            
-                                                                                                                                                                                                                                                                                                                                            if verbose == 1:
-                                                                                                                                                                                                                                                                                                                                                print 'For H_o = ' + '%1.1f' % H0 + ', Omega_M = ' + '%1.2f' % WM + ', Omega_vac = ',
-                                                                                                                                                                                                                                                                                                                                                    print '%1.2f' % WV + ', z = ' + '%1.3f' % z
-                                                                                                                                                                                                                                                                                                                                                        print 'It is now ' + '%1.1f' % age_Gyr + ' Gyr since the Big Bang.'
-                                                                                                                                                                                                                                                                                                                                                            print 'The age at redshift z was ' + '%1.1f' % zage_Gyr + ' Gyr.'
-                                                                                                                                                                                                                                                                                                                                                                print 'The light travel time was ' + '%1.1f' % DTT_Gyr + ' Gyr.'
-                                                                                                                                                                                                                                                                                                                                                                    print 'The comoving radial distance, which goes into Hubbles law, is',
-                                                                                                                                                                                                                                                                                                                                                                        print '%1.1f' % DCMR_Mpc + ' Mpc or ' + '%1.1f' % DCMR_Gyr + ' Gly.'
-                                                                                                                                                                                                                                                                                                                                                                            print 'The comoving volume within redshift z is ' + '%1.1f' % V_Gpc + ' Gpc^3.'
-                                                                                                                                                                                                                                                                                                                                                                                print 'The angular size distance D_A is ' + '%1.1f' % DA_Mpc + ' Mpc or',
-                                                                                                                                                                                                                                                                                                                                                                                    print '%1.1f' % DA_Gyr + ' Gly.'
-                                                                                                                                                                                                                                                                                                                                                                                        print 'This gives a scale of ' + '%.2f' % kpc_DA + ' kpc/".'
-                                                                                                                                                                                                                                                                                                                                                                                            print 'The luminosity distance D_L is ' + '%1.1f' % DL_Mpc + ' Mpc or ' + '%1.1f' % DL_Gyr + ' Gly.'
-                                                                                                                                                                                                                                                                                                                                                                                                print 'The distance modulus, m-M, is '+'%1.2f' % (5*log10(DL_Mpc*1e6)-5)
-                                                                                                                                                                                                                                                                                                                                                                                                    else:
-                                                                                                                                                                                                                                                                                                                                                                                                        print '%1.2f' % zage_Gyr,
-                                                                                                                                                                                                                                                                                                                                                                                                            print '%1.2f' % DCMR_Mpc,
-                                                                                                                                                                                                                                                                                                                                                                                                                print '%1.2f' % kpc_DA,
-                                                                                                                                                                                                                                                                                                                                                                                                                    print '%1.2f' % (5*log10(DL_Mpc*1e6)-5)
-
-except IndexError:
-    print 'need some values or too many values'
-except ValueError:
-    print 'nonsense value or option'
+            verbose = 0
+        z, H0, WM, WV = params(argv[1+verbose:])
+        # the same tables as server mode, so both give the same numbers
+        out = {k: float(v) for k, v in Cosmology(H0, WM, WV)(z).items()}
+        if verbose == 1:
+            print(report(float(z), H0, WM, WV, out))
+        else:
+            print(' '.join('%1.2f' % out[k] for k in BRIEF))
+
+    except IndexError:
+        print('need some values or too many values')
+    except ValueError:
+        print('nonsense value or option')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+import cosmocatalog
+import cosmology
+
+
+def test_catalog_blank_redshifts(tmp_path):
+    src = tmp_path/'in.csv'
+    src.write_text('id,z\na,0.5\nb,\nc,oops\nd\ne,2\n')
+    dst = tmp_path/'out.csv'
+    assert cosmocatalog.process(str(src), str(dst)) == 5
+    lines = dst.read_text().splitlines()
+    rows = [line.split(',') for line in lines[1:]]
+    assert [r[0] for r in rows] == ['a', 'b', 'c', 'd', 'e']
+    assert float(rows[0][2]) == pytest.approx(float(cosmology.batch(0.5)['DL_Mpc']), rel=1e-6)
+    assert all(r[2] == 'nan' for r in rows[1:4])
+
+
+def test_catalog_npy(tmp_path):
+    src = str(tmp_path/'in.npy')
+    data = np.zeros(5, dtype=[('id', 'i8'), ('z', 'f8')])
+    data['id'] = np.arange(5)
+    data['z'] = [0.1, 0.2, 0.5, 1., 3.]
+    np.save(src, data)
+    dst = str(tmp_path/'out.npy')
+    assert cosmocatalog.process(src, dst, chunk=2) == 5
+    out = np.load(dst)
+    np.testing.assert_allclose(out['DL_Mpc'], cosmology.batch(data['z'])['DL_Mpc'], rtol=1e-6)
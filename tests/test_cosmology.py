@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+import pytest
+
+import cosmogrid
+import cosmology
+from cosmotable import Cosmology, z_at_DL
+
+
+def cosmocalc(z, H0=69.6, WM=0.286, WV=None):
+    # cosmocalc.py, line for line, as a function
+    if WV is None:
+        WV = 1.0 - WM - 0.4165/(H0*H0)
+    c = 299792.458
+    Tyr = 977.8
+    h = H0/100.
+    WR = 4.165E-5/(h*h)
+    WK = 1-WM-WR-WV
+    az = 1.0/(1+1.0*z)
+    age = 0.
+    n = 1000
+    for i in range(n):
+        a = az*(i+0.5)/n
+        adot = math.sqrt(WK+(WM/a)+(WR/(a*a))+(WV*a*a))
+        age = age + 1./adot
+    zage = az*age/n
+    DTT = 0.0
+    DCMR = 0.0
+    for i in range(n):
+        a = az+(1-az)*(i+0.5)/n
+        adot = math.sqrt(WK+(WM/a)+(WR/(a*a))+(WV*a*a))
+        DTT = DTT + 1./adot
+        DCMR = DCMR + 1./(a*adot)
+    DTT = (1.-az)*DTT/n
+    DCMR = (1.-az)*DCMR/n
+    age = DTT+zage
+    ratio = 1.00
+    x = math.sqrt(abs(WK))*DCMR
+    if x > 0.1:
+        if WK > 0:
+            ratio = 0.5*(math.exp(x)-math.exp(-x))/x
+        else:
+            ratio = math.sin(x)/x
+    else:
+        y = x*x
+        if WK < 0:
+            y = -y
+        ratio = 1. + y/6. + y*y/120.
+    DCMT = ratio*DCMR
+    DA = az*DCMT
+    DL = DA/(az*az)
+    ratio = 1.00
+    if x > 0.1:
+        if WK > 0:
+            ratio = (0.125*(math.exp(2.*x)-math.exp(-2.*x))-x/2.)/(x*x*x/3.)
+        else:
+            ratio = (x/2. - math.sin(2.*x)/4.)/(x*x*x/3.)
+    else:
+        y = x*x
+        if WK < 0:
+            y = -y
+        ratio = 1. + y/5. + (2./105.)*y*y
+    VCM = ratio*DCMR*DCMR*DCMR/3.
+    DL_Mpc = (c/H0)*DL
+    return {
+        'age_Gyr': age*(Tyr/H0), 'zage_Gyr': (Tyr/H0)*zage, 'DTT_Gyr': (Tyr/H0)*DTT,
+        'DCMR_Mpc': (c/H0)*DCMR, 'DA_Mpc': (c/H0)*DA, 'kpc_DA': (c/H0)*DA/206.264806,
+        'DL_Mpc': DL_Mpc, 'V_Gpc': 4.*math.pi*((0.001*c/H0)**3)*VCM,
+        'distmod': 5*math.log10(DL_Mpc*1e6)-5,
+    }
+
+
+# flat, open, closed and the script's default
+CASES = [(3., 69.6, 0.286, None), (0.5, 75., 0.3, 0.), (1.5, 70., 0.3, 0.9), (0.01, 50., 1., 0.)]
+
+
+@pytest.mark.parametrize('z, H0, WM, WV', CASES)
+def test_batch_matches_cosmocalc(z, H0, WM, WV):
+    ref = cosmocalc(z, H0, WM, WV)
+    out = cosmology.batch(z, H0, WM, WV)
+    for k in cosmology.COLUMNS:
+        assert out[k] == pytest.approx(ref[k], rel=1e-10)
+
+
+def test_batch_broadcasts():
+    z = np.array([0.1, 1., 3.])
+    H0 = np.array([[60.], [70.]])
+    out = cosmology.batch(z, H0)
+    assert out['DL_Mpc'].shape == (2, 3)
+    assert out['DL_Mpc'][1, 2] == pytest.approx(cosmocalc(3., 70.)['DL_Mpc'], rel=1e-10)
+
+
+@pytest.mark.parametrize('z, H0, WM, WV', CASES)
+def test_exact_paths_agree(z, H0, WM, WV):
+    # the midpoint rule of cosmocalc.py is good to ~1e-6
+    zs = np.array([z, 2*z])
+    ref, _ = cosmology.batch_adaptive(zs, H0, WM, WV, rtol=1e-12)
+    outs = [cosmology.batch(zs, H0, WM, WV), cosmology.batch_cumulative(zs, H0, WM, WV),
+            Cosmology(H0, WM, WV)(zs)]
+    for out in outs:
+        for k in ('zage_Gyr', 'DTT_Gyr', 'DCMR_Mpc', 'DL_Mpc', 'V_Gpc'):
+            np.testing.assert_allclose(out[k], ref[k], rtol=1e-5)
+
+
+def test_flat():
+    z = np.array([0.01, 0.5, 3., 20.])
+    ref, _ = cosmology.batch_adaptive(z, rtol=1e-12)
+    out = cosmology.batch_flat(z)
+    for k in ('zage_Gyr', 'DTT_Gyr', 'DCMR_Mpc'):
+        np.testing.assert_allclose(out[k], ref[k], rtol=1e-3)
+
+
+def test_gauss_kronrod():
+    value, error, neval = cosmology.gauss_kronrod(lambda x, k: np.cos(x), 0., np.array([1., 10.]),
+                                                  rtol=1e-12)
+    np.testing.assert_allclose(value, np.sin([1., 10.]), rtol=1e-12)
+    assert np.all(error < 1e-10)
+
+
+def test_gauss_kronrod_non_finite():
+    def f(x, k):
+        return np.where(k == 1, np.nan, x)
+    value, error, _ = cosmology.gauss_kronrod(f, 0., np.array([1., 1., np.nan]))
+    assert value[0] == pytest.approx(0.5)
+    assert np.isnan(value[1:]).all() and np.isnan(error[1:]).all()
+
+
+def test_bouncing_cosmology_is_nan():
+    # WV = 5 has no big bang: adot is imaginary over part of the range
+    with np.errstate(invalid='ignore'):
+        out, _ = cosmology.batch_adaptive(np.array([0.5, 3.]), 70., 0.3, 5.)
+    assert np.isnan(out['zage_Gyr']).all()
+
+
+def test_invalid_redshifts_are_nan():
+    z = np.array([1., np.nan, -1., -2., np.inf])
+    zage, DTT, DCMR = cosmology.cumulative(z)
+    assert np.isfinite(zage[0]) and np.isnan(zage[1:]).all()
+    zage, DTT, DCMR = Cosmology().integrals(z)
+    assert np.isfinite(zage[0]) and np.isnan(zage[1:]).all()
+    out = Cosmology()(z)
+    assert np.isfinite(out['DL_Mpc'][0]) and np.isnan(out['DL_Mpc'][1:]).all()
+
+
+def test_tables_beyond_zmax():
+    cosmo = Cosmology(zmax=10.)
+    ref, _ = cosmology.batch_adaptive(np.array([5., 50.]), rtol=1e-12)
+    out = cosmo(np.array([5., 50.]))
+    np.testing.assert_allclose(out['DCMR_Mpc'], ref['DCMR_Mpc'], rtol=1e-6)
+
+
+def test_inverse_lookups():
+    z = np.array([0.01, 0.3, 2., 8.])
+    cosmo = Cosmology()
+    out = cosmo(z)
+    np.testing.assert_allclose(cosmo.z_at_DL(out['DL_Mpc']), z, rtol=1e-8)
+    np.testing.assert_allclose(cosmo.z_at_distmod(out['distmod']), z, rtol=1e-8)
+    np.testing.assert_allclose(cosmo.z_at_lookback(out['DTT_Gyr']), z, rtol=1e-8)
+    np.testing.assert_allclose(cosmo.z_at_age(out['zage_Gyr']), z, rtol=1e-8)
+    np.testing.assert_allclose(z_at_DL(out['DL_Mpc']), z, rtol=1e-8)
+    assert np.isnan(cosmo.z_at_DL(-1.))
+
+
+def test_grid(tmp_path):
+    path = str(tmp_path/'default.grid')
+    cosmogrid.build(path, zmax=100., nodes=1 << 12)
+    grid = cosmogrid.Grid(path)
+    # the recorded bound holds all over the cells, down to z = 0
+    z = np.concatenate((grid.z[1]*np.linspace(0., 1., 101)[1:],
+                        10**np.random.default_rng(0).uniform(-3, 2, 2000)))
+    ref, _ = cosmology.batch_adaptive(z, rtol=1e-12)
+    out = grid(z)
+    for k in cosmogrid.COLUMNS:
+        assert np.max(np.abs(out[k]/ref[k]-1)) <= 1.1*grid.max_error[k]
+    out = grid(np.array([0., -2., np.nan, 200.]))
+    assert out['DL_Mpc'][0] == 0.
+    assert np.isnan(out['DL_Mpc'][1:]).all()
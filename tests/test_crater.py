@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pytest
+
+import crater
+import cratertargets
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'cCalc003CraterPython.py')
+
+
+def script(L, v, theta, projectileDensity, targetDensity, g, targtype):
+    # the crater script itself, with its example inputs replaced, and
+    # pi for its 3.15145, stopped before it prints
+    with open(SCRIPT) as f:
+        src = f.read()
+    head, rest = src.split('# input parameters - Meteor Crater USA example')
+    body = rest[rest.index('# convert units to SI'):]
+    body = body[:body.index('print(')]
+    inputs = dict(L=L, v=v, theta=theta, projectileDensity=projectileDensity,
+                  targetDensity=targetDensity, g=g, targtype=targtype, effectRadius=10)
+    code = (head.replace('pi = 3.15145', 'pi = math.pi') +
+            ''.join('%s = %r\n' % kv for kv in inputs.items()) + body)
+    ns = {}
+    exec(code, ns)
+    return ns
+
+
+CASES = [
+    # the script's own Meteor Crater inputs, and the ones it means
+    (40., 20000., 0.787, 8000., 2500., 9.18, 2),
+    tuple(crater.METEOR[k] for k in ('L', 'v', 'theta', 'projectileDensity', 'targetDensity',
+                                     'g', 'targtype')),
+    (1., 15., 30., 3000., 1600., 9.8, 1),
+    (300., 25., 60., 2000., 1000., 9.8, 0),
+    (10000., 20., 60., 3000., 2700., 9.8, 2),
+    (1000., 18., 45., 3000., crater.rhomoon, crater.gmoon, 2),
+]
+
+
+@pytest.mark.parametrize('args', CASES)
+def test_batch_matches_script(args):
+    ref = script(*args)
+    out = crater.batch(*args)
+    for k in crater.COLUMNS:
+        if k == 'cratertype':
+            assert crater.names(out[k]) == ref[k]
+        elif k == 'megatons':
+            assert out[k] == pytest.approx(ref['projectileKE']*crater.MEGATON, rel=1e-13)
+        else:
+            assert out[k] == pytest.approx(ref[k], rel=1e-13), k
+
+
+def test_batch_arrays():
+    L = np.array([1., 40., 1000., 10000.])
+    out = crater.batch(L, 20., targtype=np.array([0, 1, 2, 2]))
+    for i in range(L.size):
+        one = crater.batch(L[i], 20., targtype=[0, 1, 2, 2][i])
+        for k in crater.COLUMNS:
+            assert out[k][i] == pytest.approx(one[k], rel=1e-14)
+
+
+def test_batch_rejects_targtype():
+    with pytest.raises(ValueError):
+        crater.batch(10., 20., targtype=3)
+    with pytest.raises(ValueError):
+        crater.batch(10., 20., targtype=1.5)
+
+
+def test_projectile_inverts_batch():
+    rng = np.random.default_rng(0)
+    n = 1000
+    args = dict(v=rng.uniform(11.2, 72., n), theta=rng.uniform(5., 90., n),
+                projectileDensity=rng.uniform(1000., 8000., n),
+                targetDensity=rng.uniform(1000., 3000., n), g=rng.uniform(1., 10., n),
+                targtype=rng.integers(0, 3, n))
+    L = 10**rng.uniform(0., 4., n)
+    out = crater.batch(L, **args)
+    np.testing.assert_allclose(crater.projectile(out['Dpiscale'], **args)['Lpiscale'], L, rtol=1e-10)
+    np.testing.assert_allclose(crater.projectile(out['Dyield'], **args)['Lyield'], L, rtol=1e-10)
+    np.testing.assert_allclose(crater.projectile(out['Dfinal'], final=True, **args)['Lpiscale'], L,
+                               rtol=1e-10)
+    # Gault's two laws overlap below 100 m, where the first one is used
+    Lg = crater.projectile(out['Dgault'], **args)['Lgault']
+    big = out['Dgault'] > 200*(crater.gmoon/args['g'])**0.165
+    np.testing.assert_allclose(Lg[big], L[big], rtol=1e-10)
+
+
+def test_targets():
+    earth = cratertargets.batch(100., 20.)
+    ref = crater.batch(100., 20., targetDensity=2500., g=crater.gEarth, targtype=2)
+    for k in crater.COLUMNS:
+        assert earth[k] == ref[k]
+    moon = cratertargets.target('moon')
+    assert moon.density == crater.rhomoon and moon.g == crater.gmoon
+    assert cratertargets.target('europa').density == 920.
+    with pytest.raises(ValueError):
+        cratertargets.target('pluto')
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+import crater
+import craterentry
+
+
+def test_entry_fates():
+    out = craterentry.impact(np.array([1., 10., 1000.]), 20.)
+    fate = out['entryfate']
+    assert list(fate) == [craterentry.AIRBURST, craterentry.AIRBURST, craterentry.GROUND]
+    # no crater for the airbursts, which is not a Simple one
+    assert list(out['cratertype'][:2]) == [craterentry.NO_CRATER]*2
+    assert np.all(out['Dfinal'][:2] == 0.)
+    assert np.all(np.isfinite(out['entryzBurst'][:2]))
+    # a 1 km impactor barely slows down
+    assert out['entryv'][2] == pytest.approx(20., rel=0.01)
+    ref = crater.batch(out['entryL'][2], out['entryv'][2], out['entrytheta'][2], 3000.)
+    assert out['Dfinal'][2] == pytest.approx(float(ref['Dfinal']), rel=1e-12)
+    assert out['cratertype'][2] == ref['cratertype']
@@ -0,0 +1,19 @@
+import numpy as np
+
+import craterentry
+import craterpop
+
+
+def test_population_with_atmosphere():
+    pop = craterpop.simulate(2000, Lmin=10., atmosphere=True)
+    assert pop.fates.sum() == 2000 == pop.impacts
+    assert pop.cratertype.sum() == pop.fates[craterentry.GROUND]
+    assert pop.Dfinal.counts.sum()+pop.Dfinal.under+pop.Dfinal.over == pop.fates[craterentry.GROUND]
+
+
+def test_population_years():
+    # the mean number of impacts only counts impactors up to Lmax
+    years = 1e7
+    mean = craterpop.RATE*(craterpop.n_larger(100.)-craterpop.n_larger(200.))*years
+    counts = [craterpop.simulate(years=years, Lmin=100., Lmax=200., seed=s).impacts for s in range(5)]
+    assert abs(np.mean(counts)-mean) < 5*np.sqrt(mean/5)
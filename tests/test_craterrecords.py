@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+import crater
+import craterrecords
+
+
+def test_columns_append_and_load(tmp_path):
+    path = str(tmp_path/'run')
+    L = np.array([10., 40., 1000.])
+    rec = craterrecords.records(crater.batch(L, 20.))
+    with craterrecords.Columns(path) as cols:
+        cols.append(rec)
+    with craterrecords.Columns(path) as cols:
+        assert len(cols) == 3
+        cols.append(rec[:1])
+    out = craterrecords.load(path)
+    assert sorted(out) == sorted(craterrecords.DTYPE.names)
+    np.testing.assert_array_equal(out['Dfinal'], np.concatenate((rec['Dfinal'], rec['Dfinal'][:1])))
+    assert out['cratertype'].dtype == np.uint8
+
+
+def test_run(tmp_path):
+    path = str(tmp_path/'run')
+    assert craterrecords.run(path, 1000, chunk=300) == 1000
+    assert craterrecords.run(path, 500, seed=1) == 1500
+    out = craterrecords.load(path, ['Dfinal'])
+    assert out['Dfinal'].shape == (1500,) and np.all(out['Dfinal'] > 0)
+
+
+def _opened(path):
+    # the files of path this process has open
+    fds = '/proc/self/fd'
+    return [f for f in (os.path.realpath(os.path.join(fds, fd)) for fd in os.listdir(fds))
+            if f.startswith(path)]
+
+
+def test_columns_length_mismatch(tmp_path):
+    path = str(tmp_path/'run')
+    with craterrecords.Columns(path) as cols:
+        cols.append(craterrecords.records(crater.batch(np.array([10., 20.]), 20.)))
+    os.remove(os.path.join(path, 'Tform.npy'))
+    with pytest.raises(ValueError):
+        craterrecords.Columns(path)
+    # the missing column was not created, and nothing is left open
+    assert not os.path.exists(os.path.join(path, 'Tform.npy'))
+    assert not _opened(path)
+
+
+def test_columns_wrong_dtype(tmp_path):
+    path = str(tmp_path/'run')
+    os.makedirs(path)
+    np.save(os.path.join(path, 'Tform.npy'), np.zeros(0, dtype='f4'))
+    with pytest.raises(ValueError):
+        craterrecords.Columns(path)
+    assert not _opened(path)
+    assert os.listdir(path) == ['Tform.npy']
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+import crater
+import craterservice
+
+
+@pytest.mark.parametrize('scenario', [
+    {'L': 0, 'v': 20}, {'L': -1, 'v': 20}, {'L': float('nan'), 'v': 20}, {'L': 10, 'v': float('inf')},
+    {'L': 10, 'v': 20, 'theta': 0}, {'L': 10, 'v': 20, 'theta': 95}, {'L': 10, 'v': 20, 'g': 0},
+    {'L': 10, 'v': 20, 'targetDensity': -2500}, {'L': 10, 'v': 20, 'targtype': 3},
+    {'L': 10}, {'L': 10, 'v': 20, 'mass': 1}, {'preset': 'tunguska'}, [10, 20],
+])
+def test_normalize_rejects(scenario):
+    with pytest.raises(ValueError):
+        craterservice.normalize(scenario)
+
+
+def test_presets():
+    for name in craterservice.PRESETS:
+        craterservice.normalize({'preset': name})
+    key = craterservice.normalize({'preset': 'meteor', 'L': 50})
+    assert key[0] == 50. and key[1] == crater.METEOR['v']
+
+
+def _post(port, body):
+    async def go():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        data = json.dumps(body).encode()
+        writer.write(b'POST /crater HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n'
+                     % len(data) + data)
+        status = int((await reader.readline()).split()[1])
+        reply = (await reader.read()).split(b'\r\n\r\n', 1)[1]
+        writer.close()
+        return status, json.loads(reply)
+    return go()
+
+
+def test_service():
+    async def go():
+        service = craterservice.Service()
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            ok = await _post(port, [{'preset': 'meteor'}, {'L': 100, 'v': 20}])
+            bad = await _post(port, {'L': 100, 'v': 20, 'theta': 0})
+            again = await _post(port, {'preset': 'meteor'})
+        return service, ok, bad, again
+    service, ok, bad, again = asyncio.run(go())
+    assert ok[0] == 200
+    ref = crater.batch(**crater.METEOR)
+    assert ok[1][0]['Dfinal'] == pytest.approx(float(ref['Dfinal']), rel=1e-14)
+    assert ok[1][0]['cratertype'] == crater.names(ref['cratertype'])
+    assert bad[0] == 400 and 'theta' in bad[1]['error']
+    assert again[1] == ok[1][0]
+    assert service.hits == 1 and service.errors == 1
+
+
+def test_cancelled_request():
+    async def go():
+        service = craterservice.Service(window=0.05)
+        scenario = {'L': 10, 'v': 20}
+        first = asyncio.ensure_future(service.scenarios([scenario, {'L': 11, 'v': 20}]))
+        second = asyncio.ensure_future(service.scenarios([scenario]))
+        await asyncio.sleep(0)
+        first.cancel()
+        # the cancelled request does not take the other one down with it
+        res = await asyncio.wait_for(second, 1.)
+        third = await asyncio.wait_for(service.scenarios([scenario, {'L': 11, 'v': 20}]), 1.)
+        assert first.cancelled()
+        return service, res, third
+    service, res, third = asyncio.run(go())
+    assert res[0] == third[0]
+    assert third[1]['Dfinal'] > 0
+    assert not service.inflight
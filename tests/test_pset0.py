@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pytest
+
+import cosmology
+import pset0Test
+
+
+def test_answer_matches_batch():
+    result = pset0Test.answer({'z': [0.5, 3.], 'H0': 69.6, 'WM': 0.286, 'WV': 0.714})
+    ref = cosmology.batch(np.array([0.5, 3.]), 69.6, 0.286, 0.714)
+    for k in pset0Test.BRIEF:
+        np.testing.assert_allclose(result[k], ref[k], rtol=1e-5)
+
+
+@pytest.mark.parametrize('request_', [
+    {'z': -1.}, {'z': [1., float('nan')]}, {'z': 1., 'H0': 0.}, {'z': 1., 'H0': -70.},
+    {'H0': 70.}, {'z': 1., 'WM': 0.3},
+])
+def test_answer_rejects(request_):
+    with pytest.raises(ValueError):
+        pset0Test.answer(request_)
+
+
+# a bad cosmology must not write warnings to the server's stderr
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+def test_serve_errors():
+    lines = ['{"z": 1}', 'not json', '{"z": -2}', '{"z": 1, "H0": 0}', '[]',
+             '{"z": 1, "H0": 70, "WM": 0.3, "WV": 5}']
+    replies = []
+    pset0Test.serve(lines, replies.append)
+    replies = [json.loads(r) for r in replies]
+    assert 'error' not in replies[0]
+    assert all('error' in r for r in replies[1:4])
+    assert replies[4] == []
+    # a bouncing cosmology has no finite answer
+    assert 'error' in replies[5]